@@ -1,8 +1,13 @@
+import os
 from django import forms
+from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
+from .images import delete_profile_pictures
 from .models import Profile
 
+PROFILE_PICTURE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
 class UserRegistrationForm(UserCreationForm):
     email = forms.EmailField(required=True)
     first_name = forms.CharField(max_length=30, required=True)
@@ -22,13 +27,62 @@ class UserRegistrationForm(UserCreationForm):
         return user
 
 class ProfileUpdateForm(forms.ModelForm):
+    remove_profile_picture = forms.BooleanField(required=False, label='Remove profile picture')
+
     class Meta:
         model = Profile
-        fields = ['phone_number', 'address', 'city', 'state', 'zip_code', 'country', 'date_of_birth', 'profile_picture']
+        fields = ['phone_number', 'address', 'city', 'state', 'zip_code', 'country', 'date_of_birth', 'profile_picture_upload']
+        labels = {
+            'profile_picture_upload': 'Profile picture',
+        }
         widgets = {
             'date_of_birth': forms.DateInput(attrs={'type': 'date'}),
+            'profile_picture_upload': forms.ClearableFileInput(attrs={'accept': 'image/*'}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not (self.instance.profile_picture or self.instance.profile_picture_upload):
+            del self.fields['remove_profile_picture']
+
+    def clean_profile_picture_upload(self):
+        # The upload is only checked cheaply here; decoding happens in the
+        # background worker (accounts.images), never in the request.
+        upload = self.cleaned_data.get('profile_picture_upload')
+        if upload and upload is not self.initial.get('profile_picture_upload'):
+            extension = os.path.splitext(upload.name)[1].lower()
+            if extension not in PROFILE_PICTURE_EXTENSIONS:
+                raise forms.ValidationError('Upload a JPEG, PNG, GIF or WebP image.')
+            if upload.size > settings.PROFILE_PICTURE_MAX_UPLOAD_SIZE:
+                limit = settings.PROFILE_PICTURE_MAX_UPLOAD_SIZE // (1024 * 1024)
+                raise forms.ValidationError(f'Profile pictures must be smaller than {limit} MB.')
+        return upload
+
+    def clean(self):
+        cleaned_data = super().clean()
+        upload = cleaned_data.get('profile_picture_upload')
+        if cleaned_data.get('remove_profile_picture') and upload and upload is not self.initial.get('profile_picture_upload'):
+            raise forms.ValidationError('Either upload a new picture or remove the current one, not both.')
+        return cleaned_data
+
+    def save(self, commit=True):
+        upload = self.cleaned_data.get('profile_picture_upload')
+        previous = self.initial.get('profile_picture_upload')
+        stale = []
+        if self.cleaned_data.get('remove_profile_picture') or upload is False:
+            # Clearing a pending upload or ticking "remove" drops the processed
+            # picture too; otherwise there would be no way to get rid of it
+            stale = [self.instance.profile_picture.name, previous.name if previous else None]
+            self.instance.profile_picture = None
+            self.instance.profile_picture_upload = None
+        elif upload and previous and upload is not previous:
+            # A new upload replaces one still waiting to be processed
+            stale = [previous.name]
+        profile = super().save(commit)
+        if commit:
+            delete_profile_pictures(*stale)
+        return profile
+
 class UserUpdateForm(forms.ModelForm):
     class Meta:
         model = User
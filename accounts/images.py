@@ -0,0 +1,133 @@
+"""
+Background processing of uploaded profile pictures.
+
+The request only stores the raw upload (``Profile.profile_picture_upload``);
+decoding, EXIF orientation, resizing, metadata stripping and transcoding
+to WebP happen on a small per-process thread pool once the upload has
+been committed. Until then ``Profile.profile_picture_url`` serves a
+placeholder.
+
+Jobs live only in the worker process. Gunicorn waits for them before a
+worker exits (``finish_pending``, from gunicorn.conf.py), and the
+``process_profile_pictures`` command picks up anything a crashed or
+killed worker left pending.
+"""
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import Profile
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    with _executor_lock:
+        # Threads don't survive a fork, so each worker process gets its own pool
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PROFILE_IMAGE_WORKERS,
+                thread_name_prefix='profile-images',
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def finish_pending():
+    """Wait for this process's queued pictures, e.g. before the worker exits."""
+    global _executor
+    with _executor_lock:
+        executor = _executor if _executor_pid == os.getpid() else None
+        _executor = None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def enqueue_profile_picture(profile_id):
+    """Process a profile's pending upload once the current transaction commits."""
+    transaction.on_commit(lambda: _get_executor().submit(_run, profile_id))
+
+
+def delete_profile_pictures(*names):
+    """Delete stored picture files once the current transaction commits."""
+    names = [name for name in names if name]
+
+    def delete():
+        for name in names:
+            default_storage.delete(name)
+
+    if names:
+        transaction.on_commit(delete)
+
+
+def _run(profile_id):
+    close_old_connections()
+    try:
+        process_profile_picture(profile_id)
+    except Exception:
+        logger.exception('Processing profile picture for profile %s failed', profile_id)
+    finally:
+        connection.close()
+
+
+def render_derivative(source, size):
+    """Decode ``source`` and return an upright, metadata-free WebP thumbnail."""
+    with Image.open(source) as image:
+        # Let JPEG decode at a reduced scale when the original is huge
+        image.draft('RGB', (size * 2, size * 2))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        image.thumbnail((size, size), Image.LANCZOS)
+        output = BytesIO()
+        # Saving without an exif argument drops EXIF/GPS metadata
+        image.save(output, format='WEBP', quality=85, method=4)
+    return output.getvalue()
+
+
+def process_profile_picture(profile_id):
+    row = Profile.objects.filter(pk=profile_id).values('profile_picture', 'profile_picture_upload').first()
+    if not row or not row['profile_picture_upload']:
+        return False
+    upload_name = row['profile_picture_upload']
+
+    try:
+        with default_storage.open(upload_name, 'rb') as source:
+            data = render_derivative(source, settings.PROFILE_PICTURE_SIZE)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        logger.warning('Discarding unreadable profile picture upload %s', upload_name)
+        Profile.objects.filter(pk=profile_id, profile_picture_upload=upload_name).update(profile_picture_upload=None)
+        default_storage.delete(upload_name)
+        return False
+
+    derivative_name = default_storage.save(
+        f'profile_pics/{profile_id}-{uuid.uuid4().hex[:12]}.webp', ContentFile(data)
+    )
+    # Only publish if no newer upload replaced this one meanwhile
+    updated = Profile.objects.filter(pk=profile_id, profile_picture_upload=upload_name).update(
+        profile_picture=derivative_name,
+        profile_picture_upload=None,
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        default_storage.delete(derivative_name)
+        return False
+
+    default_storage.delete(upload_name)
+    if row['profile_picture']:
+        default_storage.delete(row['profile_picture'])
+    return True
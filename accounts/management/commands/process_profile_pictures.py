@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from accounts.images import process_profile_picture
+from accounts.models import Profile
+
+class Command(BaseCommand):
+    help = 'Process profile picture uploads left pending (e.g. after a worker restart)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=5,
+                            help='Skip uploads newer than this many minutes, which a worker may still be processing')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['min_age'])
+        pending = (
+            Profile.objects.exclude(profile_picture_upload='').exclude(profile_picture_upload=None)
+            .filter(updated_at__lt=cutoff)
+        )
+        processed = 0
+        for profile_id in pending.values_list('pk', flat=True).iterator():
+            if process_profile_picture(profile_id):
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} profile pictures'))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='profile_picture_upload',
+            field=models.FileField(blank=True, null=True, upload_to='profile_pics/uploads/'),
+        ),
+    ]
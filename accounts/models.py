@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.fields.files import FieldFile
+from django.templatetags.static import static
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -13,17 +15,76 @@ class Profile(models.Model):
     country = models.CharField(max_length=100, blank=True, null=True)
     date_of_birth = models.DateField(blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    # Raw upload waiting for accounts.images to turn it into profile_picture
+    profile_picture_upload = models.FileField(upload_to='profile_pics/uploads/', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Fields whose loaded values are remembered for dirty checking
+    TRACKED_FIELDS = (
+        'phone_number', 'address', 'city', 'state', 'zip_code', 'country',
+        'date_of_birth', 'profile_picture', 'profile_picture_upload',
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaded_values = self._tracked_values()
+
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
+    def _tracked_values(self):
+        deferred = self.get_deferred_fields()
+        values = {}
+        for name in self.TRACKED_FIELDS:
+            if name in deferred:
+                continue
+            value = getattr(self, name)
+            # Compare files by name; FieldFile equality needs the instance
+            values[name] = value.name if isinstance(value, FieldFile) else value
+        return values
+
+    @property
+    def profile_picture_pending(self):
+        return bool(self.profile_picture_upload)
+
+    @property
+    def profile_picture_url(self):
+        """URL of the processed picture, or a placeholder while one is pending."""
+        if self.profile_picture:
+            return self.profile_picture.url
+        if self.profile_picture_pending:
+            return static('images/profile-placeholder.svg')
+        return None
+
+    @property
+    def changed_fields(self):
+        current = self._tracked_values()
+        return [name for name, value in current.items() if self._loaded_values.get(name, value) != value]
+
+    @property
+    def has_changed(self):
+        return self._state.adding or bool(self.changed_fields)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = self._tracked_values()
+
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+def save_user_profile(sender, instance, created, **kwargs):
+    # Only a profile already loaded on this user instance can carry pending
+    # edits; reading it here would cost a query on every user save (e.g. the
+    # last_login update on each login) just to write back unchanged data.
+    if created or not User.profile.is_cached(instance):
+        return
+    try:
+        profile = instance.profile
+    except Profile.DoesNotExist:
+        return
+    if profile.has_changed:
+        profile.save()
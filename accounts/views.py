@@ -5,6 +5,7 @@ from django.contrib.auth import login
 from django.views.generic import CreateView
 from django.urls import reverse_lazy
 from .forms import UserRegistrationForm, ProfileUpdateForm, UserUpdateForm
+from .images import enqueue_profile_picture
 from .models import Profile
 
 class RegisterView(CreateView):
@@ -25,8 +26,11 @@ def profile(request):
         profile_form = ProfileUpdateForm(request.POST, request.FILES, instance=request.user.profile)
         
         if user_form.is_valid() and profile_form.is_valid():
+            # Profile first, so saving the user finds nothing left to write
+            profile = profile_form.save()
             user_form.save()
-            profile_form.save()
+            if 'profile_picture_upload' in profile_form.changed_data and profile.profile_picture_upload:
+                enqueue_profile_picture(profile.pk)
             messages.success(request, 'Profile updated successfully!')
             return redirect('profile')
     else:
@@ -0,0 +1,96 @@
+"""
+Async variants of the cart endpoints the storefront calls with XHR, served
+by the ASGI entry point (sidewind/asgi.py).
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.http import Http404, JsonResponse
+from django.shortcuts import redirect
+from products.models import Product
+from sidewind.metrics import CART_ADDS
+from .models import CART_TOTALS, CENTS, Cart, CartItem
+
+async def is_authenticated(request):
+    # request.user is a lazy object that queries the session and user tables
+    return await sync_to_async(lambda: request.user.is_authenticated)()
+
+async def aget_or_create_cart(request):
+    if await is_authenticated(request):
+        cart, created = await Cart.objects.aget_or_create(user=request.user)
+    else:
+        if not request.session.session_key:
+            await sync_to_async(request.session.create)()
+        cart, created = await Cart.objects.aget_or_create(session_key=request.session.session_key)
+    return cart
+
+async def cart_totals(cart):
+    # One aggregate instead of Cart.item_count/total_price walking the items
+    totals = await cart.items.aaggregate(
+        cart_count=CART_TOTALS['item_count'], cart_total=CART_TOTALS['total_price'],
+    )
+    totals['cart_total'] = totals['cart_total'].quantize(CENTS)
+    return totals
+
+async def add_to_cart(request, product_id):
+    if request.method == 'POST':
+        try:
+            product = await Product.objects.aget(id=product_id, available=True)
+        except Product.DoesNotExist:
+            raise Http404('No Product matches the given query.')
+        cart = await aget_or_create_cart(request)
+        quantity = int(request.POST.get('quantity', 1))
+        
+        # Check if product is already in cart
+        cart_item, created = await CartItem.objects.aget_or_create(
+            cart=cart,
+            product=product,
+            defaults={'quantity': quantity}
+        )
+        
+        if not created:
+            cart_item.quantity += quantity
+            await cart_item.asave()
+        CART_ADDS.inc()
+        
+        messages.success(request, f'{product.name} added to cart!')
+        
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            totals = await cart_totals(cart)
+            return JsonResponse({
+                'success': True,
+                'message': f'{product.name} added to cart!',
+                'cart_count': totals['cart_count'],
+            })
+        
+        return redirect('cart_detail')
+    
+    return redirect('product_list')
+
+async def update_cart(request, item_id):
+    if request.method == 'POST':
+        try:
+            cart_item = await CartItem.objects.select_related('cart').aget(id=item_id)
+        except CartItem.DoesNotExist:
+            raise Http404('No CartItem matches the given query.')
+        cart = cart_item.cart
+        
+        # Check if user owns this cart
+        if await is_authenticated(request) and cart.user_id != request.user.pk:
+            messages.error(request, 'You do not have permission to modify this cart.')
+            return redirect('cart_detail')
+        
+        quantity = int(request.POST.get('quantity', 1))
+        
+        if quantity > 0:
+            cart_item.quantity = quantity
+            await cart_item.asave()
+            messages.success(request, 'Cart updated successfully!')
+        else:
+            await cart_item.adelete()
+            messages.success(request, 'Item removed from cart!')
+        
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            totals = await cart_totals(cart)
+            return JsonResponse({'success': True, **totals})
+    
+    return redirect('cart_detail')
@@ -1,6 +1,15 @@
-from .models import Cart
+from sidewind.cache import cached
+from sidewind.pagecache import caching_page
+from .models import CART_CACHE_NAMESPACE, Cart
 
-def cart(request):
+def cart_summary(cart):
+    # Prices come from the catalog, so the summary goes stale with either
+    return cached(
+        ('catalog', CART_CACHE_NAMESPACE.format(cart.pk)), 'summary',
+        compute=cart.totals,
+    )
+
+def find_cart(request):
     if request.user.is_authenticated:
         cart, created = Cart.objects.get_or_create(user=request.user)
     else:
@@ -10,9 +19,16 @@ def cart(request):
                 cart = Cart.objects.get(session_key=request.session.session_key)
             except Cart.DoesNotExist:
                 pass
-    
+    return cart
+
+def cart(request):
+    if caching_page(request):
+        # A shared page: the browser fills in the badge from cart_status
+        return {'cart': None, 'cart_item_count': None, 'cart_total': None}
+    cart = find_cart(request)
+    summary = cart_summary(cart) if cart else {'item_count': 0, 'total_price': 0}
     return {
         'cart': cart,
-        'cart_item_count': cart.item_count if cart else 0,
-        'cart_total': cart.total_price if cart else 0,
+        'cart_item_count': summary['item_count'],
+        'cart_total': summary['total_price'],
     }
@@ -0,0 +1,141 @@
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+ENGINES = {
+    'stock': 'django.db.backends.sqlite3',
+    'tuned': 'sidewind.backends.sqlite3',
+}
+PRODUCTS = 50
+CARTS_PER_WORKER = 20
+
+
+def _configure(db_path, engine):
+    # Runs in a freshly spawned process: point Django at the scratch
+    # database before anything opens a connection.
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sidewind.settings')
+    from django.conf import settings
+    settings.DATABASES = {'default': {'ENGINE': ENGINES[engine], 'NAME': db_path}}
+    import django
+    django.setup()
+
+
+def _prepare(db_path, engine, workers):
+    _configure(db_path, engine)
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from cart.models import Cart
+    from products.models import Category, Product
+
+    call_command('migrate', verbosity=0)
+    category = Category.objects.create(name='Bench', slug='bench')
+    Product.objects.bulk_create([
+        Product(category=category, name=f'Bench {i}', slug=f'bench-{i}', description='',
+                price=10 + i, stock=1000, image='products/bench.jpg')
+        for i in range(PRODUCTS)
+    ])
+    for worker in range(workers):
+        for i in range(CARTS_PER_WORKER):
+            user = User.objects.create(username=f'bench-{worker}-{i}')
+            Cart.objects.create(user=user)
+
+
+def _work(db_path, engine, worker, duration, checkout_ratio):
+    _configure(db_path, engine)
+    from django.db import OperationalError, transaction
+    from cart.models import Cart, CartItem
+    from orders.models import Order, OrderItem
+    from products.models import Product
+
+    rng = random.Random(worker)
+    product_ids = list(Product.objects.values_list('id', flat=True))
+    carts = list(Cart.objects.filter(user__username__startswith=f'bench-{worker}-'))
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    while time.perf_counter() < deadline:
+        cart = rng.choice(carts)
+        started = time.perf_counter()
+        try:
+            if rng.random() < checkout_ratio:
+                # Checkout: read the cart, then write the order and its items
+                with transaction.atomic():
+                    items = list(cart.items.select_related('product'))
+                    subtotal = sum(item.total_price for item in items)
+                    order = Order.objects.create(
+                        user_id=cart.user_id, cart=cart, first_name='Bench', last_name='User',
+                        email='bench@example.com', phone='0', address='-', city='-', state='-',
+                        zip_code='0', country='-', subtotal=subtotal, total=subtotal,
+                    )
+                    OrderItem.objects.bulk_create([
+                        OrderItem(order=order, product=item.product, product_name=item.product.name,
+                                  product_price=item.product.current_price, quantity=item.quantity,
+                                  total_price=item.total_price)
+                        for item in items
+                    ])
+            else:
+                # Add to cart: read-modify-write, as in cart.views.add_to_cart
+                with transaction.atomic():
+                    item, created = CartItem.objects.get_or_create(
+                        cart=cart, product_id=rng.choice(product_ids), defaults={'quantity': 1},
+                    )
+                    if not created:
+                        item.quantity += 1
+                        item.save(update_fields=['quantity', 'updated_at'])
+        except OperationalError:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+
+    return latencies, errors
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = 'Measure cart and checkout write throughput on SQLite with several worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent worker processes')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds each run lasts')
+        parser.add_argument('--checkout-ratio', type=float, default=0.2,
+                            help='Share of operations that are checkouts rather than cart adds')
+        parser.add_argument('--engine', choices=['stock', 'tuned', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        engines = ['stock', 'tuned'] if options['engine'] == 'both' else [options['engine']]
+        context = multiprocessing.get_context('spawn')
+        for engine in engines:
+            scratch = tempfile.mkdtemp(prefix='sidewind-bench-')
+            db_path = os.path.join(scratch, 'bench.sqlite3')
+            try:
+                with context.Pool(1) as pool:
+                    pool.apply(_prepare, (db_path, engine, options['workers']))
+                with context.Pool(options['workers']) as pool:
+                    results = pool.starmap(_work, [
+                        (db_path, engine, worker, options['duration'], options['checkout_ratio'])
+                        for worker in range(options['workers'])
+                    ])
+            finally:
+                shutil.rmtree(scratch, ignore_errors=True)
+
+            latencies = [value for worker_latencies, _ in results for value in worker_latencies]
+            errors = sum(worker_errors for _, worker_errors in results)
+            throughput = len(latencies) / options['duration']
+            self.stdout.write(
+                f'{engine:>6}: {throughput:8.1f} writes/s  '
+                f'p50 {statistics.median(latencies) * 1000 if latencies else 0:6.1f} ms  '
+                f'p99 {_percentile(latencies, 99) * 1000:7.1f} ms  '
+                f'{errors} "database is locked" errors'
+            )
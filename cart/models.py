@@ -1,6 +1,38 @@
+from decimal import ROUND_HALF_UP, Decimal
 from django.db import models
+from django.db.models import DecimalField, ExpressionWrapper, F, Prefetch, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
-from products.models import Product
+from products.models import Product, current_price_expression
+from sidewind.cache import bump_namespace
+
+# Cache namespace for values derived from one cart's items
+CART_CACHE_NAMESPACE = 'cart-{}'
+
+CENTS = Decimal('0.01')
+LINE_TOTAL = ExpressionWrapper(
+    F('quantity') * current_price_expression('product__'),
+    output_field=DecimalField(max_digits=12, decimal_places=2),
+)
+# Aggregates over a cart's items, matching Cart.item_count and total_price
+CART_TOTALS = {
+    'item_count': Coalesce(Sum('quantity'), 0),
+    'total_price': Coalesce(Sum(LINE_TOTAL), Value(0), output_field=DecimalField(max_digits=12, decimal_places=2)),
+}
+# Checkout pricing: 8% tax, free shipping from $100
+TAX_RATE = Decimal('0.08')
+FREE_SHIPPING_FROM = Decimal('100.00')
+SHIPPING = Decimal('10.00')
+
+def order_totals(subtotal):
+    """Tax, shipping and total for a cart subtotal, as the cart page shows and checkout charges."""
+    # Rounded to cents so the amount sent to Stripe is the stored total,
+    # whether the order is new or read back on a retry
+    tax = (subtotal * TAX_RATE).quantize(CENTS, ROUND_HALF_UP)
+    shipping = SHIPPING if subtotal < FREE_SHIPPING_FROM else Decimal('0.00')
+    return {'subtotal': subtotal, 'tax': tax, 'shipping': shipping, 'total': subtotal + tax + shipping}
 
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
@@ -15,11 +47,31 @@ class Cart(models.Model):
 
     @property
     def total_price(self):
-        return sum(item.total_price for item in self.items.all())
+        return self.totals()['total_price']
 
     @property
     def item_count(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.totals()['item_count']
+
+    def totals(self):
+        # Walk the items only when they are already loaded; otherwise one
+        # aggregate instead of a query per item's product
+        if 'items' in getattr(self, '_prefetched_objects_cache', {}):
+            items = self.items.all()
+            return {
+                'item_count': sum(item.quantity for item in items),
+                'total_price': sum((item.total_price for item in items), Decimal(0)),
+            }
+        totals = self.items.aggregate(**CART_TOTALS)
+        totals['total_price'] = Decimal(totals['total_price']).quantize(CENTS)
+        return totals
+
+def prefetch_cart_items(cart):
+    """Load a cart's items with their products for pages that list them."""
+    models.prefetch_related_objects(
+        [cart], Prefetch('items', queryset=CartItem.objects.select_related('product__category')),
+    )
+    return cart
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
@@ -34,3 +86,8 @@ class CartItem(models.Model):
     @property
     def total_price(self):
         return self.quantity * self.product.current_price
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def invalidate_cart_cache(sender, instance, **kwargs):
+    bump_namespace(CART_CACHE_NAMESPACE.format(instance.cart_id))
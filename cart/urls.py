@@ -7,4 +7,5 @@ urlpatterns = [
     path('remove/<int:item_id>/', views.remove_from_cart, name='remove_from_cart'),
     path('update/<int:item_id>/', views.update_cart, name='update_cart'),
     path('clear/', views.clear_cart, name='clear_cart'),
+    path('status/', views.cart_status, name='cart_status'),
 ]
@@ -2,9 +2,12 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import never_cache
 from products.models import Product
-from .models import Cart, CartItem
-from decimal import Decimal
+from sidewind.metrics import CART_ADDS
+from .context_processors import cart_summary, find_cart
+from .models import Cart, CartItem, order_totals, prefetch_cart_items
 
 def get_or_create_cart(request):
     if request.user.is_authenticated:
@@ -31,6 +34,7 @@ def add_to_cart(request, product_id):
         if not created:
             cart_item.quantity += quantity
             cart_item.save()
+        CART_ADDS.inc()
         
         messages.success(request, f'{product.name} added to cart!')
         
@@ -90,21 +94,17 @@ def update_cart(request, item_id):
     return redirect('cart_detail')
 
 def cart_detail(request):
-    cart = get_or_create_cart(request)
+    cart = prefetch_cart_items(get_or_create_cart(request))
     
-    # Calculate tax and shipping
-    subtotal = cart.total_price
-    tax_rate = Decimal('0.08')  # 8%
-    tax_amount = subtotal * tax_rate
-    shipping_cost = Decimal('0') if subtotal >= Decimal('100') else Decimal('10.00')
-    total = subtotal + tax_amount + shipping_cost
+    # The same totals checkout charges
+    totals = order_totals(cart.total_price)
     
     context = {
         'cart': cart,
-        'subtotal': subtotal,
-        'tax_amount': tax_amount,
-        'shipping_cost': shipping_cost,
-        'total': total,
+        'subtotal': totals['subtotal'],
+        'tax_amount': totals['tax'],
+        'shipping_cost': totals['shipping'],
+        'total': totals['total'],
     }
     return render(request, 'cart/cart_detail.html', context)
 
@@ -115,3 +115,14 @@ def clear_cart(request):
         messages.success(request, 'Cart cleared successfully!')
     
     return redirect('cart_detail')
+
+@never_cache
+def cart_status(request):
+    # The per-visitor parts of pages served from the page cache
+    cart = find_cart(request)
+    summary = cart_summary(cart) if cart else {'item_count': 0, 'total_price': 0}
+    return JsonResponse({
+        'item_count': summary['item_count'],
+        'total_price': str(summary['total_price']),
+        'csrf_token': get_token(request),
+    })
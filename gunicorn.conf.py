@@ -0,0 +1,89 @@
+"""
+Gunicorn configuration, picked up automatically from the working directory.
+
+Every setting can be overridden from the environment; see DEPLOYMENT.md.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+cpu_count = multiprocessing.cpu_count()
+
+# Workers write Prometheus samples here for /metrics to aggregate (see
+# sidewind/metrics.py). Set before the app is preloaded, and emptied so a
+# restart doesn't resume the previous run's counters.
+prometheus_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'sidewind-prometheus'),
+)
+shutil.rmtree(prometheus_dir, ignore_errors=True)
+os.makedirs(prometheus_dir, exist_ok=True)
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# Async workers (see sidewind/asgi.py) multiplex connections themselves, so
+# one per core is enough to keep them busy. Thread-based sync workers
+# (GUNICORN_WORKER_CLASS=gthread with sidewind.wsgi) follow gunicorn's
+# usual 2 x cores + 1.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+default_workers = cpu_count + 1 if 'uvicorn' in worker_class else cpu_count * 2 + 1
+workers = int(os.environ.get('WEB_CONCURRENCY', default_workers))
+if worker_class == 'gthread':
+    # Request threads mostly wait on I/O: aim for about 4 x cores requests
+    # in flight per host, spread over the workers. Other worker classes
+    # keep gunicorn's single thread (more would turn sync into gthread).
+    default_threads = max(2, -(-cpu_count * 4 // workers))
+    threads = int(os.environ.get('GUNICORN_THREADS', default_threads))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+# Import Django once in the master and fork workers from it, so the
+# imported code is shared copy-on-write instead of loaded per worker.
+preload_app = True
+
+# Restart each worker after a number of requests to cap memory growth.
+# The jitter keeps workers from all restarting at the same time.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    from django.core.cache import caches
+    from django.db import connections
+    from sidewind.warmup import warm_up_code
+
+    warm_up_code()
+    # Workers must open their own sockets rather than share the master's
+    connections.close_all()
+    caches.close_all()
+
+
+def post_worker_init(worker):
+    from sidewind.warmup import warm_up_caches
+
+    try:
+        warm_up_caches()
+    except Exception:
+        # A cold cache is no reason to keep the worker out of service
+        worker.log.exception('Cache warm-up failed')
+    finally:
+        from django.db import connections
+        connections.close_all()
+
+
+def worker_exit(server, worker):
+    from accounts.images import finish_pending
+
+    # Pictures queued in this worker would otherwise be dropped when
+    # max_requests recycles it
+    finish_pending()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
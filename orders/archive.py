@@ -0,0 +1,86 @@
+"""
+Order archival.
+
+Delivered and cancelled orders that haven't changed for
+``ORDER_ARCHIVE_AFTER_DAYS`` are copied into ``ArchivedOrder`` /
+``ArchivedOrderItem`` and deleted from the live tables, one bounded batch
+per transaction. Archived orders keep their id, so ``get_order_or_404``
+can fall back to the archive for the same URLs.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import Http404
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+ARCHIVABLE_STATUSES = ('delivered', 'cancelled')
+
+ORDER_FIELDS = [
+    field.attname for field in ArchivedOrder._meta.concrete_fields if field.name != 'archived_at'
+]
+ITEM_FIELDS = [
+    field.attname for field in ArchivedOrderItem._meta.concrete_fields if field.name != 'id'
+]
+
+
+def archivable_orders(older_than_days=None):
+    if older_than_days is None:
+        older_than_days = settings.ORDER_ARCHIVE_AFTER_DAYS
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    return Order.objects.filter(status__in=ARCHIVABLE_STATUSES, updated_at__lt=cutoff)
+
+
+def archive_batch(queryset, batch_size):
+    """Move up to ``batch_size`` orders from ``queryset`` into the archive."""
+    with transaction.atomic():
+        orders = list(queryset.order_by('id')[:batch_size])
+        if not orders:
+            return 0
+        ids = [order.id for order in orders]
+        items = OrderItem.objects.filter(order_id__in=ids).order_by('order_id', 'id')
+
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(**{name: getattr(order, name) for name in ORDER_FIELDS})
+            for order in orders
+        ])
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(**{name: getattr(item, name) for name in ITEM_FIELDS})
+            for item in items
+        ])
+
+        OrderItem.objects.filter(order_id__in=ids).delete()
+        Order.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def archive_orders(older_than_days=None, batch_size=None, max_batches=None):
+    """Archive eligible orders in batches; returns how many were moved."""
+    batch_size = batch_size or settings.ORDER_ARCHIVE_BATCH_SIZE
+    queryset = archivable_orders(older_than_days)
+    archived = batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(queryset, batch_size)
+        archived += moved
+        batches += 1
+        if moved < batch_size:
+            break
+    return archived
+
+
+def get_order_or_404(items=None, **lookup):
+    """Fetch an order from the live table, or from the archive if it's been moved.
+
+    ``items`` optionally narrows the queryset used to prefetch live order items.
+    """
+    try:
+        return Order.objects.prefetch_related(Prefetch('items', queryset=items)).get(**lookup)
+    except Order.DoesNotExist:
+        pass
+    try:
+        return ArchivedOrder.objects.prefetch_related('items').get(**lookup)
+    except ArchivedOrder.DoesNotExist:
+        raise Http404('No order matches the given query.')
@@ -1,7 +1,11 @@
+import uuid
 from django import forms
 from .models import Order
 
 class CheckoutForm(forms.ModelForm):
+    # Issued once per form render; a resubmission carries the same key back
+    idempotency_key = forms.RegexField(regex=r'^[0-9a-f]{32}$', widget=forms.HiddenInput)
+
     class Meta:
         model = Order
         fields = [
@@ -24,6 +28,9 @@ class CheckoutForm(forms.ModelForm):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
         
+        if not self.is_bound:
+            self.fields['idempotency_key'].initial = uuid.uuid4().hex
+        
         if user and user.is_authenticated:
             # Pre-fill form with user profile data if available
             if hasattr(user, 'profile'):
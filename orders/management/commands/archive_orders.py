@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from orders.archive import archivable_orders, archive_orders
+
+class Command(BaseCommand):
+    help = 'Move old delivered and cancelled orders into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+                            help='Archive orders not updated for this many days')
+        parser.add_argument('--batch-size', type=int, default=settings.ORDER_ARCHIVE_BATCH_SIZE,
+                            help='Orders moved per transaction')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the orders that would be archived')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = archivable_orders(options['older_than_days']).count()
+            self.stdout.write(f'{count} orders would be archived')
+            return
+
+        archived = archive_orders(
+            older_than_days=options['older_than_days'],
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} orders'))
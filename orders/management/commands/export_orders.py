@@ -0,0 +1,35 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from orders.export import EXPORT_FORMATS, date_range, stream_export
+
+class Command(BaseCommand):
+    help = 'Stream orders and their items for a date range as CSV or JSON lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True, help='First day to export (YYYY-MM-DD)')
+        parser.add_argument('--end', required=True, help='Last day to export, inclusive (YYYY-MM-DD)')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip')
+        parser.add_argument('--output', default='-', help='File to write to (default: stdout)')
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start'])
+            end = date.fromisoformat(options['end'])
+        except ValueError:
+            raise CommandError('--start and --end must be dates in YYYY-MM-DD format')
+
+        chunks = stream_export(*date_range(start, end), export_format=options['format'], compress=options['gzip'])
+        if options['output'] == '-':
+            out = sys.stdout.buffer
+            for chunk in chunks:
+                out.write(chunk)
+            out.flush()
+            return
+
+        with open(options['output'], 'wb') as out:
+            for chunk in chunks:
+                out.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f'Exported orders to {options["output"]}'))
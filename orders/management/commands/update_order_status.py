@@ -0,0 +1,54 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from orders.models import Order
+from orders.transitions import TRANSITIONS, transition_order_ids
+
+class Command(BaseCommand):
+    help = 'Bulk move orders, listed by order number (e.g. from a carrier feed), to a new status'
+
+    def add_arguments(self, parser):
+        parser.add_argument('field', choices=sorted(TRANSITIONS), help='Which status to change')
+        parser.add_argument('value', help='Target status, e.g. shipped or paid')
+        parser.add_argument('--file', default='-',
+                            help='File with one order number per line, or the first CSV column (default: stdin)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['value'] not in TRANSITIONS[options['field']]:
+            choices = ', '.join(sorted(TRANSITIONS[options['field']]))
+            raise CommandError(f'{options["field"]} can only be set to: {choices}')
+
+        source = sys.stdin if options['file'] == '-' else open(options['file'])
+        try:
+            order_numbers = []
+            for line in source:
+                number = line.split(',', 1)[0].strip()
+                if number:
+                    order_numbers.append(number)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        order_numbers = list(dict.fromkeys(order_numbers))
+        size = options['batch_size']
+        found = 0
+
+        def id_batches():
+            nonlocal found
+            for start in range(0, len(order_numbers), size):
+                ids = list(
+                    Order.objects.filter(order_number__in=order_numbers[start:start + size])
+                    .values_list('pk', flat=True)
+                )
+                found += len(ids)
+                yield ids
+
+        updated, skipped = transition_order_ids(id_batches(), options['field'], options['value'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {updated} orders; {skipped} were not in a state that allows {options["value"]}'
+        ))
+        missing = len(order_numbers) - found
+        if missing:
+            self.stdout.write(self.style.WARNING(f'{missing} order numbers were not found'))
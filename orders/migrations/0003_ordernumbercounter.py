@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:59
+
+from django.db import migrations, models
+
+
+def create_order_counter(apps, schema_editor):
+    OrderNumberCounter = apps.get_model('orders', 'OrderNumberCounter')
+    OrderNumberCounter.objects.using(schema_editor.connection.alias).get_or_create(name='order')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_order_counter, migrations.RunPython.noop),
+    ]
@@ -2,7 +2,6 @@ from django.db import models
 from django.contrib.auth.models import User
 from products.models import Product
 from cart.models import Cart
-import uuid
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -38,6 +37,9 @@ class Order(models.Model):
     stripe_payment_intent = models.CharField(max_length=255, blank=True, null=True)
     payment_status = models.CharField(max_length=20, default='pending')
     
+    # Checkout form token, so a resubmitted form maps back to this order
+    idempotency_key = models.CharField(max_length=64, blank=True, null=True, editable=False)
+    
     # Order status
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     
@@ -47,6 +49,16 @@ class Order(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            models.Index(fields=['stripe_payment_intent'], name='order_payment_intent_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'idempotency_key'],
+                name='unique_order_idempotency_key',
+            ),
+        ]
     
     def __str__(self):
         return f"Order {self.order_number}"
@@ -57,7 +69,8 @@ class Order(models.Model):
         super().save(*args, **kwargs)
     
     def generate_order_number(self):
-        return f"SW{uuid.uuid4().hex[:8].upper()}"
+        from .numbering import next_order_number
+        return next_order_number()
     
     @property
     def full_name(self):
@@ -67,11 +80,21 @@ class Order(models.Model):
     def full_address(self):
         return f"{self.address}, {self.city}, {self.state} {self.zip_code}, {self.country}"
 
+class OrderNumberCounter(models.Model):
+    """High-water mark of counter values reserved for order numbers."""
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     product_name = models.CharField(max_length=200)
     product_price = models.DecimalField(max_digits=10, decimal_places=2)
+    # The product's list price when ordered, for measuring discounts
+    list_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     quantity = models.PositiveIntegerField()
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     
@@ -83,6 +106,72 @@ class OrderItem(models.Model):
             self.product_name = self.product.name
         if not self.product_price:
             self.product_price = self.product.current_price
+        if self._state.adding and self.list_price is None:
+            self.list_price = self.product.price
         if not self.total_price:
             self.total_price = self.product_price * self.quantity
         super().save(*args, **kwargs)
+
+class ArchivedOrder(models.Model):
+    """A finished order moved out of the hot ``Order`` table, keeping its id."""
+    id = models.BigIntegerField(primary_key=True)
+    order_number = models.CharField(max_length=20, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders')
+    
+    # Shipping information
+    first_name = models.CharField(max_length=50)
+    last_name = models.CharField(max_length=50)
+    email = models.EmailField()
+    phone = models.CharField(max_length=15)
+    address = models.TextField()
+    city = models.CharField(max_length=100)
+    state = models.CharField(max_length=100)
+    zip_code = models.CharField(max_length=10)
+    country = models.CharField(max_length=100)
+    
+    # Order details
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+    tax = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    shipping = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    # Payment information
+    stripe_payment_intent = models.CharField(max_length=255, blank=True, null=True)
+    payment_status = models.CharField(max_length=20, default='pending')
+    
+    # Order status
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    
+    # Timestamps, copied from the live order
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    is_archived = True
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Order {self.order_number} (archived)"
+    
+    @property
+    def full_name(self):
+        return f"{self.first_name} {self.last_name}"
+    
+    @property
+    def full_address(self):
+        return f"{self.address}, {self.city}, {self.state} {self.zip_code}, {self.country}"
+
+class ArchivedOrderItem(models.Model):
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    # Products may be removed long after an order is archived
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    product_name = models.CharField(max_length=200)
+    product_price = models.DecimalField(max_digits=10, decimal_places=2)
+    list_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    quantity = models.PositiveIntegerField()
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    def __str__(self):
+        return f"{self.quantity}x {self.product_name}"
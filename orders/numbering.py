@@ -0,0 +1,143 @@
+"""
+Order number allocation.
+
+Each process reserves a block of counter values from ``OrderNumberCounter``
+and hands them out locally, so the counter row is touched once per
+``ORDER_NUMBER_BLOCK_SIZE`` orders and only for the length of one UPDATE.
+Counter values are passed through a keyed Feistel permutation before being
+encoded, which is a bijection over 50 bits: distinct counter values always
+give distinct order numbers, so numbering never needs a retry, while
+consecutive orders don't expose volume or guessable neighbours. On SQLite,
+an order saved inside a transaction takes a single value within that
+transaction instead, since SQLite only ever has one writer.
+"""
+import hashlib
+import hmac
+import os
+import threading
+
+from django.conf import settings
+from django.db import connections, router
+
+BITS = 50
+HALF_BITS = BITS // 2
+HALF_MASK = (1 << HALF_BITS) - 1
+ROUNDS = 4
+
+# Crockford base32: no I, L, O or U, so numbers read back unambiguously
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+ENCODED_LENGTH = BITS // 5
+
+
+def _round(key, index, value):
+    digest = hmac.new(key, f'{index}:{value}'.encode(), hashlib.sha256).digest()
+    return int.from_bytes(digest[:4], 'big') & HALF_MASK
+
+
+def scramble(value):
+    """Map a counter value onto a unique, non-sequential 50-bit number."""
+    key = settings.ORDER_NUMBER_SECRET.encode()
+    left, right = value >> HALF_BITS, value & HALF_MASK
+    for index in range(ROUNDS):
+        left, right = right, left ^ _round(key, index, right)
+    return (left << HALF_BITS) | right
+
+
+def encode(value):
+    chars = []
+    for _ in range(ENCODED_LENGTH):
+        value, remainder = divmod(value, 32)
+        chars.append(ALPHABET[remainder])
+    return ''.join(reversed(chars))
+
+
+class BlockAllocator:
+    """Hands out counter values from blocks reserved in the database."""
+
+    def __init__(self, name, block_size):
+        self.name = name
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._pid = None
+        self._next = self._end = 0
+
+    def allocate(self, using):
+        connection = connections[using]
+        if connection.in_atomic_block and connection.vendor == 'sqlite':
+            # SQLite has a single writer, and under BEGIN IMMEDIATE the
+            # caller's transaction already holds the write lock, so a second
+            # connection could never reserve. Take one value inside the
+            # caller's transaction instead: it commits or rolls back together
+            # with the order that uses it.
+            with connection.cursor() as cursor:
+                end = self._advance(cursor, connection, 1)
+            return end - 1
+        with self._lock:
+            # A forked worker must not reuse the block its parent reserved
+            if self._pid != os.getpid() or self._next >= self._end:
+                self._next, self._end = self._reserve(connection, using, self.block_size)
+                self._pid = os.getpid()
+            value = self._next
+            self._next += 1
+        return value
+
+    def reserve(self, count, using):
+        """Reserve ``count`` values in one go, e.g. for a bulk import."""
+        return range(*self._reserve(connections[using], using, count))
+
+    def _reserve(self, connection, using, size):
+        if connection.in_atomic_block:
+            # Reserving inside the caller's transaction would hold the counter
+            # row lock until it commits, and hand out the block twice if it
+            # rolled back, so use a short-lived connection of our own instead.
+            connection = connections.create_connection(using)
+            try:
+                return self._reserve_block(connection, size)
+            finally:
+                connection.close()
+        return self._reserve_block(connection, size)
+
+    def _reserve_block(self, connection, size):
+        autocommit = connection.get_autocommit()
+        connection.set_autocommit(False)
+        try:
+            with connection.cursor() as cursor:
+                end = self._advance(cursor, connection, size)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.set_autocommit(autocommit)
+        return end - size, end
+
+    def _advance(self, cursor, connection, size):
+        """Move the counter on by ``size`` and return its new value."""
+        from .models import OrderNumberCounter
+
+        table = connection.ops.quote_name(OrderNumberCounter._meta.db_table)
+        cursor.execute(f'UPDATE {table} SET value = value + %s WHERE name = %s', [size, self.name])
+        if cursor.rowcount == 0:
+            cursor.execute(f'INSERT INTO {table} (name, value) VALUES (%s, %s)', [self.name, size])
+        cursor.execute(f'SELECT value FROM {table} WHERE name = %s', [self.name])
+        return cursor.fetchone()[0]
+
+
+allocator = BlockAllocator('order', settings.ORDER_NUMBER_BLOCK_SIZE)
+
+
+def format_order_number(value):
+    return f"SW{encode(scramble(value))}"
+
+
+def next_order_number():
+    from .models import OrderNumberCounter
+
+    return format_order_number(allocator.allocate(router.db_for_write(OrderNumberCounter)))
+
+
+def reserve_order_numbers(count):
+    """Return ``count`` fresh order numbers, for creating orders in bulk."""
+    from .models import OrderNumberCounter
+
+    return [format_order_number(value) for value in allocator.reserve(count, router.db_for_write(OrderNumberCounter))]
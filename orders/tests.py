@@ -0,0 +1,78 @@
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from cart.models import Cart, CartItem, order_totals
+from products.models import Category, Product
+from .models import Order
+from .views import CHECKOUT_RESULTS_SESSION_KEY
+
+LOCMEM = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+CHECKOUT_FORM = {
+    'first_name': 'Test', 'last_name': 'Customer', 'email': 'test@example.com', 'phone': '555-0100',
+    'address': '1 Main St', 'city': 'Austin', 'state': 'TX', 'zip_code': '78701', 'country': 'United States',
+    'idempotency_key': 'a' * 32,
+}
+
+
+class OrderTotalsTests(TestCase):
+    def test_tax_and_total_are_rounded_to_cents(self):
+        totals = order_totals(Decimal('12.99'))
+        self.assertEqual(totals['tax'], Decimal('1.04'))
+        self.assertEqual(totals['total'], Decimal('24.03'))
+
+
+@override_settings(
+    CACHES={'default': LOCMEM, 'tiered': LOCMEM, 'namespaces': LOCMEM, 'sessions': LOCMEM},
+    SESSION_ENGINE='django.contrib.sessions.backends.db',
+)
+class CheckoutReplayTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('customer', 'test@example.com', 'password')
+        category = Category.objects.create(name='Shirts', slug='shirts')
+        product = Product.objects.create(
+            category=category, name='Shirt', slug='shirt', description='A shirt',
+            price=Decimal('12.99'), image='products/shirt.jpg', stock=10,
+        )
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=product, quantity=1)
+        self.client.force_login(self.user)
+
+    def submit(self, create):
+        with mock.patch('stripe.PaymentIntent.create', create):
+            return self.client.post(reverse('checkout'), CHECKOUT_FORM)
+
+    def payment_intents_created(self):
+        return REGISTRY.get_sample_value('sidewind_payment_intents_created_total') or 0
+
+    def test_cart_page_shows_the_amount_checkout_charges(self):
+        response = self.client.get(reverse('cart_detail'))
+        self.assertEqual(response.context['tax_amount'], Decimal('1.04'))
+        self.assertEqual(response.context['total'], Decimal('24.03'))
+
+    def test_replayed_submission_sends_stripe_the_same_amount(self):
+        create = mock.Mock(return_value=SimpleNamespace(id='pi_test', client_secret='pi_test_secret'))
+        created = self.payment_intents_created()
+        self.assertEqual(self.submit(create).status_code, 200)
+
+        # Forget the remembered result, so the retry reads the order back
+        # from the database the way a retry after a Stripe error does
+        session = self.client.session
+        del session[CHECKOUT_RESULTS_SESSION_KEY]
+        session.save()
+        self.assertEqual(self.submit(create).status_code, 200)
+
+        order = Order.objects.get(user=self.user)
+        self.assertEqual(order.total, Decimal('24.03'))
+        self.assertEqual(create.call_count, 2)
+        first, retry = (call.kwargs for call in create.call_args_list)
+        self.assertEqual(first['amount'], 2403)
+        self.assertEqual(retry['amount'], first['amount'])
+        self.assertEqual(retry['idempotency_key'], first['idempotency_key'])
+        # Stripe answered the retry with the same intent
+        self.assertEqual(self.payment_intents_created(), created + 1)
@@ -0,0 +1,59 @@
+"""
+Set-based order status changes.
+
+Each target state lists the states it may be reached from. Bulk updates
+put that rule in the WHERE clause, so a batch is one UPDATE and orders in
+any other state are skipped rather than rejected one by one.
+"""
+from django.utils import timezone
+
+from sidewind.pagination import id_batches
+
+from .models import Order
+
+STATUS_TRANSITIONS = {
+    'processing': ('pending',),
+    'shipped': ('processing',),
+    'delivered': ('shipped',),
+    'cancelled': ('pending', 'processing'),
+}
+PAYMENT_STATUS_TRANSITIONS = {
+    'paid': ('pending', 'failed'),
+    'failed': ('pending',),
+    'refunded': ('paid',),
+}
+TRANSITIONS = {
+    'status': STATUS_TRANSITIONS,
+    'payment_status': PAYMENT_STATUS_TRANSITIONS,
+}
+
+
+def allowed_sources(field, target):
+    try:
+        return TRANSITIONS[field][target]
+    except KeyError:
+        raise ValueError(f"Orders can't be bulk moved to {field}={target!r}")
+
+
+def transition_order_ids(batches, field, target):
+    """Move orders, given as batches of ids, to ``target`` where allowed.
+
+    Issues one UPDATE per batch. Returns ``(updated, skipped)``.
+    """
+    sources = allowed_sources(field, target)
+    updated = 0
+    seen = 0
+    for ids in batches:
+        if not ids:
+            continue
+        updated += Order.objects.filter(pk__in=ids, **{f'{field}__in': sources}).update(
+            updated_at=timezone.now(), **{field: target}
+        )
+        seen += len(ids)
+    return updated, seen - updated
+
+
+def transition_orders(queryset, field, target, batch_size=1000):
+    """Move the orders in ``queryset`` to ``target`` where allowed."""
+    allowed_sources(field, target)
+    return transition_order_ids(id_batches(queryset, batch_size), field, target)
@@ -8,4 +8,5 @@ urlpatterns = [
     path('payment/success/', views.payment_success, name='payment_success'),
     path('payment/cancel/', views.payment_cancel, name='payment_cancel'),
     path('webhook/', views.payment_webhook, name='payment_webhook'),
+    path('export/', views.export_orders, name='export_orders'),
 ]
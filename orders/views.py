@@ -1,21 +1,88 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.conf import settings
-from django.http import JsonResponse
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 import stripe
-from decimal import Decimal
+from datetime import date, datetime, timezone as dt_timezone
 from .models import Order, OrderItem
 from .forms import CheckoutForm
+from .archive import get_order_or_404
+from .export import CONTENT_TYPES, EXPORT_FORMATS, astream_export, date_range, stream_export
+from cart.models import order_totals, prefetch_cart_items
 from cart.views import get_or_create_cart
+from sidewind.metrics import CHECKOUTS_STARTED, PAYMENT_INTENTS_CREATED, record_webhook
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
+# Session key holding the outcome of recent checkout submissions, by token
+CHECKOUT_RESULTS_SESSION_KEY = 'checkout_results'
+CHECKOUT_RESULTS_KEPT = 5
+
+def _render_payment(request, order, client_secret):
+    return render(request, 'orders/payment.html', {
+        'order': order,
+        'client_secret': client_secret,
+        'stripe_publishable_key': settings.STRIPE_PUBLISHABLE_KEY,
+    })
+
+def _remember_checkout(request, key, order, client_secret):
+    results = request.session.get(CHECKOUT_RESULTS_SESSION_KEY, {})
+    results[key] = {'order_id': order.id, 'client_secret': client_secret}
+    request.session[CHECKOUT_RESULTS_SESSION_KEY] = dict(list(results.items())[-CHECKOUT_RESULTS_KEPT:])
+
+def _create_order(form, user, cart, key):
+    """Create the order for a checkout token, or return the one it already made."""
+    existing = Order.objects.filter(user=user, idempotency_key=key).first()
+    if existing:
+        return existing
+    
+    cart_items = list(cart.items.all())
+    
+    order = form.save(commit=False)
+    order.user = user
+    order.cart = cart
+    order.idempotency_key = key
+    
+    # Calculate totals
+    totals = order_totals(sum(item.total_price for item in cart_items))
+    order.subtotal = totals['subtotal']
+    order.tax = totals['tax']
+    order.shipping = totals['shipping']
+    order.total = totals['total']
+    # Allocate outside the transaction so the reservation never waits on it
+    order.order_number = order.generate_order_number()
+    
+    try:
+        with transaction.atomic():
+            order.save()
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=cart_item.product,
+                    product_name=cart_item.product.name,
+                    product_price=cart_item.product.current_price,
+                    list_price=cart_item.product.price,
+                    quantity=cart_item.quantity,
+                    total_price=cart_item.total_price
+                )
+                for cart_item in cart_items
+            ])
+    except IntegrityError:
+        # A concurrent submission of the same form won the race
+        return Order.objects.get(user=user, idempotency_key=key)
+    return order
+
 @login_required
 def checkout(request):
-    cart = get_or_create_cart(request)
+    cart = prefetch_cart_items(get_or_create_cart(request))
     
     if not cart.items.exists():
         messages.error(request, 'Your cart is empty.')
@@ -24,82 +91,140 @@ def checkout(request):
     if request.method == 'POST':
         form = CheckoutForm(request.POST, user=request.user)
         if form.is_valid():
-            # Create order
-            order = form.save(commit=False)
-            order.user = request.user
-            order.cart = cart
+            key = form.cleaned_data['idempotency_key']
             
-            # Calculate totals
-            subtotal = cart.total_price
-            tax = subtotal * Decimal('0.08')  # 8% tax
-            shipping = Decimal('10.00') if subtotal < Decimal('100.00') else Decimal('0.00')
-            total = subtotal + tax + shipping
+            # Replayed submission: hand back the payment page we already built
+            previous = request.session.get(CHECKOUT_RESULTS_SESSION_KEY, {}).get(key)
+            if previous:
+                order = Order.objects.filter(id=previous['order_id'], user=request.user).first()
+                if order:
+                    return _render_payment(request, order, previous['client_secret'])
             
-            order.subtotal = subtotal
-            order.tax = tax
-            order.shipping = shipping
-            order.total = total
-            order.save()
-            
-            # Create order items
-            for cart_item in cart.items.all():
-                OrderItem.objects.create(
-                    order=order,
-                    product=cart_item.product,
-                    product_name=cart_item.product.name,
-                    product_price=cart_item.product.current_price,
-                    quantity=cart_item.quantity,
-                    total_price=cart_item.total_price
-                )
+            order = _create_order(form, request.user, cart, key)
             
-            # Create Stripe payment intent
+            # Create Stripe payment intent. The idempotency key makes Stripe
+            # return the original intent if this order already asked for one.
             try:
                 intent = stripe.PaymentIntent.create(
-                    amount=int(total * 100),  # Convert to cents
+                    amount=int(order.total * 100),  # Convert to cents
                     currency='usd',
                     metadata={
                         'order_id': order.id,
                         'order_number': order.order_number,
-                    }
+                    },
+                    idempotency_key=f'checkout-{request.user.pk}-{key}',
                 )
-                order.stripe_payment_intent = intent.id
-                order.save()
-                
-                return render(request, 'orders/payment.html', {
-                    'order': order,
-                    'client_secret': intent.client_secret,
-                    'stripe_publishable_key': settings.STRIPE_PUBLISHABLE_KEY,
-                })
-                
             except stripe.error.StripeError as e:
+                # Keep the order: resubmitting this form retries the payment
+                # intent against it instead of building a new one.
                 messages.error(request, f'Payment error: {str(e)}')
-                order.delete()
-                return redirect('checkout')
+                return render(request, 'orders/checkout.html', {
+                    'form': form, 'cart': cart, **order_totals(cart.total_price),
+                })
+
+            if order.stripe_payment_intent != intent.id:
+                # A replayed submission gets the same intent back; count it once
+                PAYMENT_INTENTS_CREATED.inc()
+                order.stripe_payment_intent = intent.id
+                order.save(update_fields=['stripe_payment_intent', 'updated_at'])
+            
+            _remember_checkout(request, key, order, intent.client_secret)
+            return _render_payment(request, order, intent.client_secret)
     else:
         form = CheckoutForm(user=request.user)
+        CHECKOUTS_STARTED.inc()
     
     context = {
         'form': form,
         'cart': cart,
+        **order_totals(cart.total_price),
     }
     return render(request, 'orders/checkout.html', context)
 
+ORDERS_PER_PAGE = 20
+
+def _encode_cursor(order):
+    micros = int(order.created_at.timestamp() * 1_000_000)
+    return f'{micros}-{order.id}'
+
+def _decode_cursor(value):
+    try:
+        micros, order_id = (int(part) for part in value.split('-'))
+        created_at = datetime.fromtimestamp(micros / 1_000_000, tz=dt_timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        return None
+    return created_at, order_id
+
 @login_required
 def order_list(request):
-    orders = request.user.orders.all()
+    # Keyset pagination on (created_at, id): every page is one index range
+    # scan, however far back the customer pages.
+    orders = (
+        request.user.orders
+        .only('id', 'user_id', 'order_number', 'created_at', 'status', 'payment_status', 'total')
+        .annotate(item_count=Coalesce(Sum('items__quantity'), 0))
+        .order_by('-created_at', '-id')
+    )
+    
+    cursor = _decode_cursor(request.GET.get('before', ''))
+    if cursor:
+        created_at, order_id = cursor
+        orders = orders.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=order_id)
+        )
+    
+    orders = list(orders[:ORDERS_PER_PAGE + 1])
+    next_cursor = None
+    if len(orders) > ORDERS_PER_PAGE:
+        orders = orders[:ORDERS_PER_PAGE]
+        next_cursor = _encode_cursor(orders[-1])
+    
     context = {
         'orders': orders,
+        'next_cursor': next_cursor,
+        'is_first_page': cursor is None,
     }
     return render(request, 'orders/order_list.html', context)
 
 @login_required
 def order_detail(request, order_id):
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    items = OrderItem.objects.only(
+        'order_id', 'product_id', 'product_name', 'product_price', 'quantity', 'total_price'
+    )
+    order = get_order_or_404(items=items, id=order_id, user=request.user)
     context = {
         'order': order,
     }
     return render(request, 'orders/order_detail.html', context)
 
+@staff_member_required
+def export_orders(request):
+    try:
+        start = date.fromisoformat(request.GET['start'])
+        end = date.fromisoformat(request.GET['end'])
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest('start and end dates (YYYY-MM-DD) are required.')
+    
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f'format must be one of: {", ".join(EXPORT_FORMATS)}.')
+    compress = request.GET.get('gzip') == '1'
+    
+    filename = f'orders-{start}-{end}.{export_format}'
+    content_type = CONTENT_TYPES[export_format]
+    if compress:
+        filename += '.gz'
+        content_type = 'application/gzip'
+    
+    # An ASGI server needs an async iterator to stream without buffering
+    stream = astream_export if isinstance(request, ASGIRequest) else stream_export
+    response = StreamingHttpResponse(
+        stream(*date_range(start, end), export_format=export_format, compress=compress),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 @csrf_exempt
 @require_POST
 def payment_webhook(request):
@@ -111,8 +236,10 @@ def payment_webhook(request):
             payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
         )
     except ValueError as e:
+        record_webhook(None, 'invalid_payload')
         return JsonResponse({'error': 'Invalid payload'}, status=400)
     except stripe.error.SignatureVerificationError as e:
+        record_webhook(None, 'invalid_signature')
         return JsonResponse({'error': 'Invalid signature'}, status=400)
     
     if event['type'] == 'payment_intent.succeeded':
@@ -129,6 +256,7 @@ def payment_webhook(request):
             order.cart.items.all().delete()
             
         except Order.DoesNotExist:
+            record_webhook(event['type'], 'order_not_found')
             return JsonResponse({'error': 'Order not found'}, status=404)
     
     elif event['type'] == 'payment_intent.payment_failed':
@@ -141,8 +269,10 @@ def payment_webhook(request):
             order.status = 'cancelled'
             order.save()
         except Order.DoesNotExist:
+            record_webhook(event['type'], 'order_not_found')
             return JsonResponse({'error': 'Order not found'}, status=404)
     
+    record_webhook(event['type'], 'processed')
     return JsonResponse({'status': 'success'})
 
 def payment_success(request):
@@ -0,0 +1,53 @@
+"""
+Async variants of the catalog read views, served by the ASGI entry point
+(sidewind/asgi.py). Queries use the async ORM; templates, context
+processors and the cache helpers are sync and run through sync_to_async.
+"""
+from asgiref.sync import sync_to_async
+from django.core.paginator import Paginator
+from django.http import Http404
+from django.shortcuts import render
+
+from sidewind.conditional import conditional_page
+
+from .context_processors import get_categories
+from .models import Product
+from .views import home_listings, product_list_context, product_timestamps, search_products
+
+arender = sync_to_async(render)
+
+async def home(request):
+    # home_listings is single-flight cached; on a miss it queries in a thread
+    context = await sync_to_async(home_listings)()
+    context['categories'] = await sync_to_async(get_categories)()
+    return await arender(request, 'products/home.html', context)
+
+async def product_list(request):
+    products = search_products(request.GET)
+    
+    # Pagination: count and fetch the page up front so the template doesn't
+    # query from the render thread
+    paginator = Paginator(products, 12)
+    paginator.count = await products.acount()
+    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj.object_list = [product async for product in page_obj.object_list]
+    
+    context = await sync_to_async(product_list_context)(request.GET, page_obj)
+    return await arender(request, 'products/product_list.html', context)
+
+@conditional_page(product_timestamps)
+async def product_detail(request, slug):
+    try:
+        product = await Product.objects.select_related('category').aget(slug=slug, available=True)
+    except Product.DoesNotExist:
+        raise Http404('No Product matches the given query.')
+    related_products = [
+        related async for related in
+        Product.objects.filter(category=product.category, available=True).exclude(id=product.id)[:4]
+    ]
+    
+    context = {
+        'product': product,
+        'related_products': related_products,
+    }
+    return await arender(request, 'products/product_detail.html', context)
@@ -0,0 +1,29 @@
+from django.utils import timezone
+
+from sidewind.pagination import id_batches
+
+from .models import Product
+from .signals import catalog_changed
+
+# Boolean flags that may be flipped in bulk
+BULK_FLAGS = ('available', 'featured')
+
+
+def set_product_flags(queryset, batch_size=1000, **flags):
+    """Set boolean product flags with one UPDATE per batch; returns rows changed."""
+    unknown = set(flags) - set(BULK_FLAGS)
+    if unknown:
+        raise ValueError(f"Can't bulk update {', '.join(sorted(unknown))}")
+
+    changed = 0
+    product_ids = []
+    for ids in id_batches(queryset, batch_size):
+        # Rows already in the requested state are left alone
+        changed += Product.objects.filter(pk__in=ids).exclude(**flags).update(
+            updated_at=timezone.now(), **flags
+        )
+        product_ids.extend(ids)
+
+    if changed:
+        catalog_changed.send(sender=Product, product_ids=product_ids)
+    return changed
@@ -0,0 +1,12 @@
+from django.utils.functional import SimpleLazyObject
+
+from sidewind.cache import cached
+from .models import Category
+
+def get_categories():
+    return cached('catalog', 'categories', compute=lambda: list(Category.objects.all()))
+
+def catalog(request):
+    # The navigation lists categories on every page; only looked up when a
+    # template actually renders it.
+    return {'categories': SimpleLazyObject(get_categories)}
@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from products.bulk import BULK_FLAGS, set_product_flags
+from products.models import Product
+
+class Command(BaseCommand):
+    help = 'Bulk set available/featured on products, listed by slug or picked by category'
+
+    def add_arguments(self, parser):
+        for flag in BULK_FLAGS:
+            parser.add_argument(f'--{flag}', choices=['true', 'false'], help=f'Set {flag} to true or false')
+        parser.add_argument('--category', action='append', default=[], metavar='SLUG',
+                            help='Change every product in this category (repeatable)')
+        parser.add_argument('--file',
+                            help='File with one product slug per line, or the first CSV column (- for stdin)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        flags = {flag: options[flag] == 'true' for flag in BULK_FLAGS if options[flag]}
+        if not flags:
+            raise CommandError(f'Nothing to set; pass {" and/or ".join("--" + flag for flag in BULK_FLAGS)}')
+        if not options['category'] and not options['file']:
+            raise CommandError('Pick products with --category and/or --file')
+
+        queryset = Product.objects.none()
+        if options['category']:
+            queryset = Product.objects.filter(category__slug__in=options['category'])
+
+        slugs = []
+        if options['file']:
+            source = sys.stdin if options['file'] == '-' else open(options['file'])
+            try:
+                for line in source:
+                    slug = line.split(',', 1)[0].strip()
+                    if slug:
+                        slugs.append(slug)
+            finally:
+                if source is not sys.stdin:
+                    source.close()
+            slugs = list(dict.fromkeys(slugs))
+            queryset = queryset | Product.objects.filter(slug__in=slugs)
+
+        changed = set_product_flags(queryset, batch_size=options['batch_size'], **flags)
+
+        self.stdout.write(self.style.SUCCESS(f'{changed} products updated.'))
+        missing = len(slugs) - Product.objects.filter(slug__in=slugs).count()
+        if missing:
+            self.stdout.write(self.style.WARNING(f'{missing} product slugs were not found'))
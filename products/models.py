@@ -1,6 +1,14 @@
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Coalesce, NullIf
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.urls import reverse
 
+from sidewind.cache import bump_namespace
+
+from .signals import catalog_changed
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(max_length=100, unique=True)
@@ -50,6 +58,10 @@ class Product(models.Model):
     def is_on_sale(self):
         return self.sale_price is not None and self.sale_price < self.price
 
+def current_price_expression(prefix=''):
+    # Mirrors Product.current_price: a missing or zero sale price means full price
+    return Coalesce(NullIf(f'{prefix}sale_price', Value(0)), f'{prefix}price')
+
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='products/')
@@ -59,3 +71,11 @@ class ProductImage(models.Model):
 
     def __str__(self):
         return f"{self.product.name} - {self.alt_text}"
+
+@receiver(catalog_changed)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_cache(sender, **kwargs):
+    bump_namespace('catalog')
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent once after a bulk change to the catalog (queryset.update() skips
+# post_save), so caches can invalidate in one go. Receives product_ids.
+catalog_changed = Signal()
@@ -1,25 +1,27 @@
 from django.shortcuts import render, get_object_or_404
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Max, Q
+from sidewind.cache import cached
+from sidewind.conditional import conditional_page
+from .context_processors import get_categories
 from .models import Product, Category
 
+def home_listings():
+    return cached('catalog', 'home', compute=lambda: {
+        'featured_products': list(Product.objects.filter(featured=True, available=True)[:6]),
+        'latest_products': list(Product.objects.filter(available=True)[:8]),
+    })
+
 def home(request):
-    featured_products = Product.objects.filter(featured=True, available=True)[:6]
-    latest_products = Product.objects.filter(available=True)[:8]
-    categories = Category.objects.all()
-    
-    context = {
-        'featured_products': featured_products,
-        'latest_products': latest_products,
-        'categories': categories,
-    }
+    context = home_listings()
+    context['categories'] = get_categories()
     return render(request, 'products/home.html', context)
 
-def product_list(request):
-    products = Product.objects.filter(available=True)
+def search_products(params):
+    products = Product.objects.filter(available=True).select_related('category')
     
     # Search functionality
-    query = request.GET.get('q')
+    query = params.get('q')
     if query:
         products = products.filter(
             Q(name__icontains=query) |
@@ -28,20 +30,20 @@ def product_list(request):
         )
     
     # Category filter
-    category_slug = request.GET.get('category')
+    category_slug = params.get('category')
     if category_slug:
         products = products.filter(category__slug=category_slug)
     
     # Price filter
-    min_price = request.GET.get('min_price')
-    max_price = request.GET.get('max_price')
+    min_price = params.get('min_price')
+    max_price = params.get('max_price')
     if min_price:
         products = products.filter(price__gte=min_price)
     if max_price:
         products = products.filter(price__lte=max_price)
     
     # Sorting
-    sort_by = request.GET.get('sort')
+    sort_by = params.get('sort')
     if sort_by == 'price_low':
         products = products.order_by('price')
     elif sort_by == 'price_high':
@@ -51,24 +53,36 @@ def product_list(request):
     elif sort_by == 'newest':
         products = products.order_by('-created_at')
     
+    return products
+
+def product_list_context(params, page_obj):
+    return {
+        'page_obj': page_obj,
+        'categories': get_categories(),
+        'query': params.get('q'),
+        'category_slug': params.get('category'),
+        'min_price': params.get('min_price'),
+        'max_price': params.get('max_price'),
+        'sort_by': params.get('sort'),
+    }
+
+def product_list(request):
+    products = search_products(request.GET)
+    
     # Pagination
     paginator = Paginator(products, 12)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
-    categories = Category.objects.all()
-    
-    context = {
-        'page_obj': page_obj,
-        'categories': categories,
-        'query': query,
-        'category_slug': category_slug,
-        'min_price': min_price,
-        'max_price': max_price,
-        'sort_by': sort_by,
-    }
+    context = product_list_context(request.GET, page_obj)
     return render(request, 'products/product_list.html', context)
 
+def product_timestamps(slug):
+    return Product.objects.filter(slug=slug, available=True).values_list(
+        'updated_at', 'category__updated_at',
+    ).first()
+
+@conditional_page(product_timestamps)
 def product_detail(request, slug):
     product = get_object_or_404(Product, slug=slug, available=True)
     related_products = Product.objects.filter(category=product.category, available=True).exclude(id=product.id)[:4]
@@ -79,6 +93,13 @@ def product_detail(request, slug):
     }
     return render(request, 'products/product_detail.html', context)
 
+def category_timestamps(slug):
+    # Unavailable products count too: hiding one changes the page
+    return Category.objects.filter(slug=slug).annotate(
+        products_updated_at=Max('products__updated_at'),
+    ).values_list('updated_at', 'products_updated_at').first()
+
+@conditional_page(category_timestamps)
 def category_detail(request, slug):
     category = get_object_or_404(Category, slug=slug)
     products = Product.objects.filter(category=category, available=True)
@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from products.models import Category, Product
+from reports.models import DailyCategorySales, DailyProductSales
+from reports.reporting import (
+    METRICS, MONEY_METRICS, average_order_value, compare_periods, load_rollups, percent_change, top_n,
+)
+
+GROUPINGS = {
+    'product': (DailyProductSales, 'product_id', Product),
+    'category': (DailyCategorySales, 'category_id', Category),
+}
+
+class Command(BaseCommand):
+    help = 'Compare a sales period with the one before it and list the top sellers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Length of each period in days')
+        parser.add_argument('--end', help='Last day of the current period (YYYY-MM-DD, default yesterday)')
+        parser.add_argument('--by', choices=sorted(GROUPINGS), default='product')
+        parser.add_argument('--metric', choices=METRICS, default='revenue', help='Metric to rank by')
+        parser.add_argument('--top', type=int, default=10)
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        try:
+            last_day = date.fromisoformat(options['end']) if options['end'] else timezone.localdate() - timedelta(days=1)
+        except ValueError:
+            raise CommandError('--end must be a date in YYYY-MM-DD format')
+
+        period = timedelta(days=options['days'])
+        end = last_day + timedelta(days=1)
+        start = end - period
+        model, key_field, label_model = GROUPINGS[options['by']]
+
+        data = load_rollups(model, key_field, start - period, end)
+        keys, previous, current = compare_periods(data, start)
+
+        self.stdout.write(f'{start} to {last_day} compared with the previous {options["days"]} days')
+        for metric in METRICS:
+            before, now = int(previous[metric].sum()), int(current[metric].sum())
+            change = percent_change(before, now)
+            self.stdout.write(
+                f'  {metric:<12} {self._format(metric, now):>14}  '
+                f'(was {self._format(metric, before)}, {self._format_change(change)})'
+            )
+
+        ranking = current[options['metric']]
+        order = top_n(ranking, options['top'])
+        labels = label_model.objects.in_bulk([int(key) for key in keys[order]])
+        aov = average_order_value(current)
+
+        self.stdout.write('')
+        plural = label_model._meta.verbose_name_plural.lower()
+        self.stdout.write(f'Top {len(order)} {plural} by {options["metric"]}:')
+        for rank, index in enumerate(order, start=1):
+            key = int(keys[index])
+            # Key 0 collects rows whose product or category was deleted
+            label = labels.get(key, key or '(deleted)')
+            metric = options['metric']
+            change = percent_change(int(previous[metric][index]), int(current[metric][index]))
+            self.stdout.write(
+                f'{rank:>3}. {str(label):<40} '
+                f'{self._format(metric, int(current[metric][index])):>14}  '
+                f'{self._format_change(change):>8}  '
+                f'AOV ${aov[index] / 100:,.2f}'
+            )
+
+    def _format(self, metric, value):
+        if metric in MONEY_METRICS:
+            return f'${value / 100:,.2f}'
+        return f'{value:,}'
+
+    def _format_change(self, change):
+        if change is None:
+            return 'new'
+        return f'{change:+.1f}%'
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from reports.rollups import update_sales_rollups
+
+class Command(BaseCommand):
+    help = 'Fold orders changed since the last run into the daily sales rollups'
+
+    def handle(self, *args, **options):
+        days = update_sales_rollups()
+        for day in days:
+            self.stdout.write(f'Rebuilt rollups for {day}')
+        self.stdout.write(self.style.SUCCESS(f'Sales rollups up to date ({len(days)} days rebuilt)'))
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dailycategorysales',
+            name='category',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_sales', to='products.category'),
+        ),
+        migrations.AlterField(
+            model_name='dailyproductsales',
+            name='category',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_product_sales', to='products.category'),
+        ),
+        migrations.AlterField(
+            model_name='dailyproductsales',
+            name='product',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_sales', to='products.product'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import models
+from products.models import Category, Product
+
+class DailyProductSales(models.Model):
+    date = models.DateField()
+    # Null for items whose product has since been deleted
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, related_name='daily_sales')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='daily_product_sales')
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    discounts = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = 'Daily product sales'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='unique_daily_product_sales'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} on {self.date}"
+
+    @property
+    def average_order_value(self):
+        return self.revenue / self.order_count if self.order_count else 0
+
+class DailyCategorySales(models.Model):
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='daily_sales')
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    discounts = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = 'Daily category sales'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'category'], name='unique_daily_category_sales'),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id} on {self.date}"
+
+    @property
+    def average_order_value(self):
+        return self.revenue / self.order_count if self.order_count else 0
+
+class RollupWatermark(models.Model):
+    """Latest ``Order.updated_at`` a rollup job has folded in."""
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
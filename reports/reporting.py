@@ -0,0 +1,75 @@
+"""
+Load daily rollups into NumPy arrays for period comparisons.
+
+Money is carried as integer cents so sums stay exact.
+"""
+import numpy as np
+
+ROLLUP_DTYPE = np.dtype([
+    ('day', 'i4'),
+    ('key', 'i8'),
+    ('units', 'i8'),
+    ('revenue', 'i8'),
+    ('discounts', 'i8'),
+    ('order_count', 'i8'),
+])
+METRICS = ('units', 'revenue', 'discounts', 'order_count')
+MONEY_METRICS = ('revenue', 'discounts')
+
+
+def load_rollups(model, key_field, start, end):
+    """Rollup rows dated ``start <= date < end`` as a structured array."""
+    rows = (
+        model.objects.filter(date__gte=start, date__lt=end)
+        .values_list('date', key_field, *METRICS)
+        .iterator(chunk_size=5000)
+    )
+    return np.fromiter(
+        (
+            # Rows for deleted products and categories have no key; they share 0
+            (day.toordinal(), key or 0, units, int(revenue * 100), int(discounts * 100), order_count)
+            for day, key, units, revenue, discounts, order_count in rows
+        ),
+        dtype=ROLLUP_DTYPE,
+    )
+
+
+def totals_by_key(data, keys):
+    """Sum every metric per key, aligned with ``keys`` (zeros where absent)."""
+    totals = {metric: np.zeros(len(keys), dtype=np.int64) for metric in METRICS}
+    if len(data):
+        positions = np.searchsorted(keys, data['key'])
+        for metric in METRICS:
+            np.add.at(totals[metric], positions, data[metric])
+    return totals
+
+
+def compare_periods(data, split_day):
+    """Split ``data`` at ``split_day`` and total both halves per key.
+
+    Returns ``(keys, previous, current)``.
+    """
+    keys = np.unique(data['key'])
+    is_current = data['day'] >= split_day.toordinal()
+    return keys, totals_by_key(data[~is_current], keys), totals_by_key(data[is_current], keys)
+
+
+def average_order_value(totals):
+    """Revenue per order in cents, 0 where there were no orders."""
+    orders = totals['order_count']
+    return np.divide(totals['revenue'], orders, out=np.zeros(len(orders)), where=orders > 0)
+
+
+def top_n(values, n):
+    """Indices of the ``n`` largest values, largest first."""
+    n = min(n, len(values))
+    if n == 0:
+        return np.array([], dtype=np.intp)
+    candidates = np.argpartition(values, -n)[-n:]
+    return candidates[np.argsort(values[candidates])[::-1]]
+
+
+def percent_change(previous, current):
+    if previous == 0:
+        return None
+    return (current - previous) * 100.0 / previous
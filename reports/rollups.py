@@ -0,0 +1,139 @@
+"""
+Incremental daily sales rollups.
+
+Each run looks at orders whose ``updated_at`` moved past the stored
+watermark, and rebuilds the product and category rows for just the days
+those orders were placed on. Rebuilding a whole day, rather than adding
+deltas, keeps the rollups correct when an order is paid, refunded or
+cancelled long after it was placed. Archived orders are included, so a
+rebuilt day still counts orders that have since left the live tables.
+
+A rebuild only uses what the order items stored at checkout, so editing
+or deleting a product never changes a past day. Items whose product has
+since been deleted count under no product and no category.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    BigIntegerField, Case, Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce, Greatest, TruncDate
+from django.utils import timezone
+
+from orders.models import ArchivedOrderItem, Order, OrderItem
+from products.models import Product
+from .models import DailyCategorySales, DailyProductSales, RollupWatermark
+
+WATERMARK_NAME = 'sales'
+
+# Orders committed a moment after a run started can carry an updated_at
+# just behind its cutoff, so each run stops this far short of "now".
+SETTLE_DELAY = timedelta(minutes=1)
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def _aggregates():
+    # Discounts are measured against the list price stored with the item;
+    # items from before it was stored count no discount
+    discount = ExpressionWrapper(
+        Greatest(
+            (Coalesce('list_price', 'product_price') - F('product_price')) * F('quantity'),
+            Value(Decimal('0')),
+        ),
+        output_field=MONEY,
+    )
+    return {
+        'units': Coalesce(Sum('quantity'), 0),
+        'revenue': Coalesce(Sum('total_price'), Value(Decimal('0')), output_field=MONEY),
+        'discounts': Coalesce(Sum(discount), Value(Decimal('0')), output_field=MONEY),
+        'order_count': Count('order_id', distinct=True),
+    }
+
+
+def _with_product_keys(items):
+    # A subquery rather than a join on product, so items whose product is
+    # gone (archived orders outlive their products) are kept, with no keys
+    category = Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('category_id'))
+    return items.annotate(rollup_category_id=category).annotate(
+        rollup_product_id=Case(
+            When(rollup_category_id__isnull=True, then=Value(None)),
+            default=F('product_id'),
+            output_field=BigIntegerField(),
+        ),
+    )
+
+
+def _day_totals(items, group_by):
+    return {
+        tuple(row[field] for field in group_by): row
+        for row in _with_product_keys(items).values(*group_by).annotate(**_aggregates())
+    }
+
+
+def _merge(*groups):
+    # Live and archived orders never overlap, so their totals just add up
+    merged = {}
+    for group in groups:
+        for key, row in group.items():
+            if key in merged:
+                for field in ('units', 'revenue', 'discounts', 'order_count'):
+                    merged[key][field] += row[field]
+            else:
+                merged[key] = dict(row)
+    return merged.values()
+
+
+def rebuild_day(day):
+    paid = {'order__payment_status': 'paid', 'order__created_at__date': day}
+    sources = [OrderItem.objects.filter(**paid), ArchivedOrderItem.objects.filter(**paid)]
+
+    product_group = ('rollup_product_id', 'rollup_category_id')
+    product_rows = [
+        DailyProductSales(date=day, product_id=row['rollup_product_id'], category_id=row['rollup_category_id'],
+                          units=row['units'], revenue=row['revenue'], discounts=row['discounts'],
+                          order_count=row['order_count'])
+        for row in _merge(*(_day_totals(items, product_group) for items in sources))
+    ]
+    category_group = ('rollup_category_id',)
+    category_rows = [
+        DailyCategorySales(date=day, category_id=row['rollup_category_id'],
+                           units=row['units'], revenue=row['revenue'], discounts=row['discounts'],
+                           order_count=row['order_count'])
+        for row in _merge(*(_day_totals(items, category_group) for items in sources))
+    ]
+
+    with transaction.atomic():
+        DailyProductSales.objects.filter(date=day).delete()
+        DailyCategorySales.objects.filter(date=day).delete()
+        DailyProductSales.objects.bulk_create(product_rows)
+        DailyCategorySales.objects.bulk_create(category_rows)
+    return len(product_rows)
+
+
+def update_sales_rollups(until=None):
+    """Fold orders changed since the last run into the rollups.
+
+    Returns the list of days that were rebuilt.
+    """
+    until = until or timezone.now() - SETTLE_DELAY
+    watermark, _ = RollupWatermark.objects.get_or_create(name=WATERMARK_NAME)
+
+    changed = Order.objects.filter(updated_at__lte=until)
+    if watermark.value:
+        changed = changed.filter(updated_at__gt=watermark.value)
+    days = sorted(
+        changed.annotate(day=TruncDate('created_at'))
+        .order_by()
+        .values_list('day', flat=True)
+        .distinct()
+    )
+
+    for day in days:
+        rebuild_day(day)
+
+    watermark.value = until
+    watermark.save(update_fields=['value'])
+    return days
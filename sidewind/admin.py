@@ -1,10 +1,60 @@
-from django.contrib import admin
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
 from accounts.models import Profile
-from products.models import Category, Product, ProductImage
+from products.models import Category, Product, ProductImage, current_price_expression
 from cart.models import Cart, CartItem
-from orders.models import Order, OrderItem
+from orders.models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import NoReverseMatch, path, reverse
+from django.utils.html import format_html
+from django.utils.text import Truncator
+from orders.transitions import transition_orders
+from products.bulk import set_product_flags
+from .models import RequestProfile
+from .pagination import EstimatedCountPaginator
+from .profiling import PROFILE_PARAM, make_profile_token
+
+class LoadedRawIdWidget(ForeignKeyRawIdWidget):
+    # The form instance's already loaded related object, set per form
+    loaded = None
+
+    def label_and_url_for_value(self, value):
+        # The stock widget fetches the object again for every inline row
+        obj = self.loaded
+        if obj is None or str(obj.pk) != str(value):
+            return super().label_and_url_for_value(value)
+        try:
+            url = reverse(f'{self.admin_site.name}:{obj._meta.app_label}_{obj._meta.model_name}_change', args=(obj.pk,))
+        except NoReverseMatch:
+            url = ''
+        return Truncator(obj).words(14), url
+
+class LoadedRawIdForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name, field in self.fields.items():
+            model_field = self.instance._meta.get_field(name)
+            if isinstance(field.widget, LoadedRawIdWidget) and model_field.is_cached(self.instance):
+                field.widget.loaded = model_field.get_cached_value(self.instance)
+
+class LoadedRawIdInlineMixin:
+    """
+    Label raw_id_fields from the objects the inline's queryset already
+    select_related, instead of one query per row.
+    """
+    form = LoadedRawIdForm
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.raw_id_fields:
+            kwargs['widget'] = LoadedRawIdWidget(db_field.remote_field, self.admin_site, using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 # Register Profile model inline with User
 class ProfileInline(admin.StackedInline):
@@ -26,57 +76,139 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ['name', 'description']
     prepopulated_fields = {'slug': ('name',)}
 
+def _flag_action(description, **flags):
+    def action(modeladmin, request, queryset):
+        changed = set_product_flags(queryset, **flags)
+        modeladmin.message_user(request, f'{changed} products updated.', messages.SUCCESS)
+    action.__name__ = 'set_' + '_'.join(f'{name}_{value}'.lower() for name, value in flags.items())
+    return admin.action(description=description)(action)
+
 class ProductImageInline(admin.TabularInline):
     model = ProductImage
     extra = 1
 
+    def get_queryset(self, request):
+        # Each row's label is ProductImage.__str__, which reads the product
+        return super().get_queryset(request).select_related('product')
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ['name', 'category', 'price', 'sale_price', 'stock', 'available', 'featured', 'created_at']
     list_filter = ['available', 'featured', 'created_at', 'category']
     list_editable = ['price', 'sale_price', 'stock', 'available', 'featured']
+    list_select_related = ['category']
     search_fields = ['name', 'description']
     prepopulated_fields = {'slug': ('name',)}
     inlines = [ProductImageInline]
+    actions = [
+        _flag_action('Mark selected products available', available=True),
+        _flag_action('Mark selected products unavailable', available=False),
+        _flag_action('Feature selected products', featured=True),
+        _flag_action('Stop featuring selected products', featured=False),
+    ]
 
 @admin.register(ProductImage)
 class ProductImageAdmin(admin.ModelAdmin):
     list_display = ['product', 'alt_text', 'is_primary', 'created_at']
     list_filter = ['is_primary', 'created_at']
+    list_select_related = ['product']
     search_fields = ['product__name', 'alt_text']
+    raw_id_fields = ['product']
 
-class CartItemInline(admin.TabularInline):
+class CartItemInline(LoadedRawIdInlineMixin, admin.TabularInline):
     model = CartItem
     extra = 0
     readonly_fields = ['total_price']
+    raw_id_fields = ['product']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
+CURRENT_PRICE = current_price_expression('items__product__')
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'session_key', 'item_count', 'total_price', 'created_at']
     list_filter = ['created_at']
+    list_select_related = ['user']
     search_fields = ['user__username', 'user__email']
+    raw_id_fields = ['user']
     inlines = [CartItemInline]
     readonly_fields = ['total_price', 'item_count']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Aggregate in the changelist query instead of two item queries
+        # (plus one per product) for every row
+        line_total = ExpressionWrapper(
+            F('items__quantity') * CURRENT_PRICE,
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+        return super().get_queryset(request).annotate(
+            _item_count=Coalesce(Sum('items__quantity'), 0),
+            _total_price=Coalesce(Sum(line_total), Value(0), output_field=DecimalField(max_digits=12, decimal_places=2)),
+        )
+
+    @admin.display(description='Item count', ordering='_item_count')
+    def item_count(self, obj):
+        return obj._item_count if hasattr(obj, '_item_count') else obj.item_count
+
+    @admin.display(description='Total price', ordering='_total_price')
+    def total_price(self, obj):
+        return obj._total_price if hasattr(obj, '_total_price') else obj.total_price
 
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
     list_display = ['cart', 'product', 'quantity', 'total_price', 'created_at']
     list_filter = ['created_at']
+    list_select_related = ['cart__user', 'product']
     search_fields = ['cart__user__username', 'product__name']
+    raw_id_fields = ['cart', 'product']
     readonly_fields = ['total_price']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
-class OrderItemInline(admin.TabularInline):
+def _transition_action(field, value, description):
+    def action(modeladmin, request, queryset):
+        updated, skipped = transition_orders(queryset, field, value)
+        modeladmin.message_user(request, f'{updated} orders updated.', messages.SUCCESS)
+        if skipped:
+            modeladmin.message_user(
+                request, f'{skipped} orders skipped: they cannot move to {value} from their current state.',
+                messages.WARNING,
+            )
+    action.__name__ = f'mark_{field}_{value}'
+    return admin.action(description=description)(action)
+
+class OrderItemInline(LoadedRawIdInlineMixin, admin.TabularInline):
     model = OrderItem
     extra = 0
     readonly_fields = ['total_price']
+    raw_id_fields = ['product']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['order_number', 'user', 'full_name', 'total', 'status', 'payment_status', 'created_at']
     list_filter = ['status', 'payment_status', 'created_at']
+    list_select_related = ['user']
     search_fields = ['order_number', 'user__username', 'user__email', 'first_name', 'last_name']
+    raw_id_fields = ['user', 'cart']
     readonly_fields = ['order_number', 'subtotal', 'tax', 'shipping', 'total', 'stripe_payment_intent']
     inlines = [OrderItemInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = [
+        _transition_action('status', 'processing', 'Mark selected orders processing'),
+        _transition_action('status', 'shipped', 'Mark selected orders shipped'),
+        _transition_action('status', 'delivered', 'Mark selected orders delivered'),
+        _transition_action('status', 'cancelled', 'Cancel selected orders'),
+        _transition_action('payment_status', 'paid', 'Mark selected orders paid'),
+        _transition_action('payment_status', 'refunded', 'Mark selected orders refunded'),
+    ]
     
     fieldsets = (
         ('Order Information', {
@@ -96,9 +228,90 @@ class OrderAdmin(admin.ModelAdmin):
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ['order', 'product', 'product_name', 'quantity', 'product_price', 'total_price']
-    list_filter = ['created_at']
+    list_select_related = ['order', 'product']
     search_fields = ['order__order_number', 'product__name', 'product_name']
+    raw_id_fields = ['order', 'product']
     readonly_fields = ['total_price']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    can_delete = False
+    readonly_fields = ['product_id', 'product_name', 'product_price', 'list_price', 'quantity', 'total_price']
+    fields = readonly_fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ['order_number', 'user', 'full_name', 'total', 'status', 'payment_status', 'created_at', 'archived_at']
+    list_filter = ['status', 'payment_status', 'created_at']
+    list_select_related = ['user']
+    search_fields = ['order_number', 'user__username', 'user__email', 'first_name', 'last_name']
+    inlines = [ArchivedOrderItemInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_readonly_fields(self, request, obj=None):
+        return [field.name for field in self.model._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'method', 'path', 'status_code', 'duration_ms', 'query_count', 'db_ms', 'template_ms', 'user', 'download']
+    list_filter = ['method', 'status_code', 'created_at']
+    list_select_related = ['user']
+    search_fields = ['path', 'view_name']
+    fields = [
+        'created_at', 'user', 'method', 'path', 'view_name', 'status_code', 'duration_ms',
+        'db_ms', 'query_count', 'template_ms', 'download', 'summary', 'queries', 'templates',
+    ]
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<path:object_id>/download/', self.admin_site.admin_view(self.download_view),
+                 name='sidewind_requestprofile_download'),
+            *super().get_urls(),
+        ]
+
+    def changelist_view(self, request, extra_context=None):
+        # The token proves the request comes from this staff member; it is
+        # checked against the logged-in user, so it can't be used by others
+        messages.info(
+            request,
+            f'To profile a page, add ?{PROFILE_PARAM}={make_profile_token(request.user)} to its URL '
+            f'or send the token in an X-Profile-Token header. It is valid for '
+            f'{settings.REQUEST_PROFILE_TOKEN_MAX_AGE // 60} minutes.',
+        )
+        return super().changelist_view(request, extra_context)
+
+    @admin.display(description='Profile')
+    def download(self, obj):
+        url = reverse('admin:sidewind_requestprofile_download', args=[obj.pk])
+        return format_html('<a href="{}">Download .prof</a>', url)
+
+    def download_view(self, request, object_id):
+        profile = get_object_or_404(RequestProfile, pk=object_id)
+        if not self.has_view_permission(request, profile):
+            return HttpResponse(status=403)
+        response = HttpResponse(bytes(profile.stats), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="request-profile-{profile.pk}.prof"'
+        return response
 
 # Customize admin site
 admin.site.site_header = "Side Wind Admin"
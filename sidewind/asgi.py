@@ -0,0 +1,22 @@
+"""
+ASGI config for sidewind project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Run it under gunicorn with uvicorn workers, see the Procfile.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sidewind.settings')
+# Serve the async catalog and cart views
+os.environ.setdefault('ROOT_URLCONF', 'sidewind.asgi_urls')
+# Persistent connections belong to a thread, and under ASGI sync code runs
+# on a fresh thread per request, so kept-alive connections would pile up.
+os.environ.setdefault('CONN_MAX_AGE', '0')
+
+application = get_asgi_application()
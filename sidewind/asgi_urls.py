@@ -0,0 +1,19 @@
+"""
+URL configuration used under ASGI (sidewind/asgi.py).
+
+The hot read views and the cart's XHR endpoints resolve to their async
+variants; every other URL falls through to the regular configuration.
+"""
+from django.urls import path
+
+from cart import async_views as cart_views
+from products import async_views as product_views
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('', product_views.home, name='home'),
+    path('products/', product_views.product_list, name='product_list'),
+    path('products/<slug:slug>/', product_views.product_detail, name='product_detail'),
+    path('cart/add/<int:product_id>/', cart_views.add_to_cart, name='add_to_cart'),
+    path('cart/update/<int:item_id>/', cart_views.update_cart, name='update_cart'),
+] + sync_urlpatterns
@@ -0,0 +1,39 @@
+"""
+SQLite backend tuned for several gunicorn workers sharing one database file.
+
+Every connection switches to WAL (readers no longer block the writer),
+relaxes fsyncs to ``synchronous=NORMAL`` (safe under WAL), waits for
+locks instead of failing, and gets a larger page cache and mmap window.
+Transactions start with ``BEGIN IMMEDIATE``: a deferred transaction that
+reads first and writes later can't wait out a competing writer and fails
+straight away with "database is locked", whereas an immediate one queues
+on the busy timeout.
+
+Pragmas can be overridden per database with ``OPTIONS['pragmas']``.
+"""
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # milliseconds
+    'cache_size': -64000,  # negative means KiB, so 64 MB
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**DEFAULT_PRAGMAS, **params.pop('pragmas', {})}
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,179 @@
+"""
+Synthetic load for the storefront.
+
+``generate_bench_data`` fills the database with a large catalog, customer
+base and order history (every row prefixed with ``PREFIX``), and
+``run_benchmark`` runs ``worker`` in parallel processes. Each worker drives
+the real URL routes through Django's test client with a weighted mix of
+shopping scenarios, with Stripe replaced by ``fake_payment_intent``.
+
+This module must stay importable before ``django.setup()``: spawned workers
+import it to find ``worker``.
+"""
+import random
+import re
+import statistics
+import time
+import uuid
+from types import SimpleNamespace
+
+# Every generated row can be told apart from real data by this prefix
+PREFIX = 'bench'
+
+CATEGORY_NAMES = [
+    'Shirts', 'T-Shirts', 'Polos', 'Sweaters', 'Hoodies', 'Jackets', 'Coats', 'Suits',
+    'Blazers', 'Jeans', 'Chinos', 'Shorts', 'Sneakers', 'Boots', 'Loafers', 'Watches',
+    'Belts', 'Wallets', 'Bags', 'Sunglasses',
+]
+ADJECTIVES = [
+    'Classic', 'Slim', 'Relaxed', 'Tailored', 'Vintage', 'Essential', 'Premium', 'Rugged',
+    'Lightweight', 'Heavyweight', 'Stretch', 'Organic', 'Merino', 'Linen', 'Leather', 'Suede',
+]
+COLORS = [
+    'Black', 'White', 'Navy', 'Charcoal', 'Olive', 'Burgundy', 'Khaki', 'Grey', 'Tan', 'Indigo',
+]
+FIRST_NAMES = ['James', 'Oliver', 'Liam', 'Noah', 'Lucas', 'Mateo', 'Ethan', 'Leo', 'Arjun', 'Kenji']
+LAST_NAMES = ['Smith', 'Garcia', 'Chen', 'Okafor', 'Novak', 'Silva', 'Kumar', 'Brown', 'Rossi', 'Kim']
+CITIES = [
+    ('Austin', 'TX', '78701'), ('Denver', 'CO', '80202'), ('Seattle', 'WA', '98101'),
+    ('Boston', 'MA', '02108'), ('Chicago', 'IL', '60601'), ('Miami', 'FL', '33101'),
+]
+# (scenario, weight): roughly the mix of a browsing-heavy storefront
+SCENARIOS = [
+    ('home', 15), ('product_list', 15), ('search', 15), ('filter', 15),
+    ('product_detail', 25), ('add_to_cart', 10), ('checkout', 5),
+]
+# Relative change in p95 or throughput that --compare flags as a regression
+REGRESSION_THRESHOLD = 0.10
+IDEMPOTENCY_KEY_RE = re.compile(r'name="idempotency_key" value="([0-9a-f]{32})"')
+
+
+def fake_payment_intent(**kwargs):
+    """Stands in for Stripe so checkout can be driven without the network."""
+    intent_id = f'pi_{PREFIX}_{uuid.uuid4().hex[:24]}'
+    return SimpleNamespace(id=intent_id, client_secret=f'{intent_id}_secret')
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(samples, elapsed):
+    latencies = [latency for latency, _, _ in samples]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, _, status in samples if status >= 500),
+        'throughput': round(len(samples) / elapsed, 2) if elapsed else None,
+        'p50_ms': _ms(percentile(latencies, 50)),
+        'p95_ms': _ms(percentile(latencies, 95)),
+        'p99_ms': _ms(percentile(latencies, 99)),
+        'queries_per_request': round(statistics.mean(q for _, q, _ in samples), 2) if samples else None,
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+class Driver:
+    """Runs weighted scenarios through Django's test client in one process."""
+
+    def __init__(self, seed):
+        from django.conf import settings
+        from django.contrib.auth.models import User
+        from django.core.management.base import CommandError
+        from django.test import Client
+
+        from products.models import Product
+
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+        settings.REQUEST_TIMING_SAMPLE_RATE = 0
+
+        self.rng = random.Random(seed)
+        self.anonymous = Client()
+        self.customer = Client()
+        users = list(User.objects.filter(username__startswith=f'{PREFIX}-').values_list('id', flat=True)[:1000])
+        slugs = list(Product.objects.filter(slug__startswith=f'{PREFIX}-', available=True)
+                     .values_list('id', 'slug')[:5000])
+        if not users or not slugs:
+            raise CommandError('No benchmark data; run generate_bench_data first.')
+        self.customer.force_login(User.objects.get(pk=self.rng.choice(users)))
+        self.products = slugs
+        self.names, self.weights = zip(*SCENARIOS)
+
+    def run(self, deadline):
+        from sidewind.timing import timing
+
+        samples = {name: [] for name in self.names}
+        while time.monotonic() < deadline:
+            name = self.rng.choices(self.names, self.weights)[0]
+            for step in getattr(self, name)():
+                with timing() as timings:
+                    started = time.perf_counter()
+                    response = step()
+                    latency = time.perf_counter() - started
+                samples[name].append((latency, timings.queries, response.status_code))
+        return samples
+
+    # Scenarios yield one callable per request so each is timed on its own
+
+    def home(self):
+        yield lambda: self.anonymous.get('/')
+
+    def product_list(self):
+        yield lambda: self.anonymous.get('/products/', {'page': self.rng.randrange(1, 20)})
+
+    def search(self):
+        query = self.rng.choice([*ADJECTIVES, *COLORS])
+        yield lambda: self.anonymous.get('/products/', {'q': query})
+
+    def filter(self):
+        low = self.rng.randrange(20, 200)
+        params = {
+            'category': f'{PREFIX}-{self.rng.choice(CATEGORY_NAMES).lower()}',
+            'min_price': low, 'max_price': low + 100, 'sort': self.rng.choice(['price_low', 'newest', 'name']),
+        }
+        yield lambda: self.anonymous.get('/products/', params)
+
+    def product_detail(self):
+        _, slug = self.rng.choice(self.products)
+        yield lambda: self.anonymous.get(f'/products/{slug}/')
+
+    def add_to_cart(self):
+        product_id, _ = self.rng.choice(self.products)
+        yield lambda: self.customer.post(f'/cart/add/{product_id}/', HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def checkout(self):
+        page = {}
+
+        def start():
+            page['response'] = response = self.customer.get('/orders/checkout/')
+            return response
+
+        def submit():
+            match = IDEMPOTENCY_KEY_RE.search(page['response'].content.decode())
+            return self.customer.post('/orders/checkout/', {
+                'first_name': 'Bench', 'last_name': 'Customer', 'email': 'bench@example.com',
+                'phone': '555-0100', 'address': '1 Main St', 'city': 'Austin', 'state': 'TX',
+                'zip_code': '78701', 'country': 'United States',
+                'idempotency_key': match.group(1) if match else uuid.uuid4().hex,
+            })
+
+        yield start
+        if page['response'].status_code == 200:
+            yield submit
+
+
+def worker(index, warmup, duration, queue):
+    import django
+    django.setup()
+
+    import stripe
+    stripe.PaymentIntent.create = staticmethod(fake_payment_intent)
+
+    driver = Driver(seed=index)
+    driver.run(time.monotonic() + warmup)
+    queue.put(driver.run(time.monotonic() + duration))
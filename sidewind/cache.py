@@ -0,0 +1,308 @@
+"""
+Two-tier caching.
+
+``TieredCache`` keeps a small in-process L1 (LRU with a short TTL) in front
+of a shared L2 cache alias (file-based or Redis, see ``parse_cache_url``),
+so hot keys are served without I/O while every gunicorn worker still sees
+the same data.
+
+L1 entries are not invalidated across processes and may be stale for up to
+``L1_TIMEOUT`` seconds. Data that must change as soon as it is written
+should use ``namespaced_key``. Namespace versions are always read from
+their own shared alias (``NAMESPACE_CACHE_ALIAS``), so bumping a version
+moves every process to fresh keys at once, and entries under the old
+version simply expire. Keeping versions in a separate alias means the
+cached values themselves can't push them out. A version that is lost
+anyway (a cull, a flush) is reseeded from the clock, never from 0, so
+keys written under an old version are never read again.
+
+``bump_namespace`` waits for the current transaction to commit, so no
+request can cache the rows from before the change under the new version.
+For ``REPLICA_STICKY_SECONDS`` after a bump, a request that builds a key
+in that namespace reads from the primary, so the replica can't refill the
+new version with rows it hasn't replayed yet.
+
+``get_or_set`` is single-flight: concurrent misses on the same key, within
+a process and across processes, wait for one caller to compute the value
+instead of all hitting the database.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db import transaction
+
+from .routers import REPLICA_DB_ALIAS, pin_to_primary
+from .timing import current_timings
+
+TIERED_CACHE_ALIAS = 'tiered'
+NAMESPACE_CACHE_ALIAS = 'namespaces'
+
+BACKENDS = {
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'rediss': 'django.core.cache.backends.redis.RedisCache',
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'dummy': 'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def parse_cache_url(url, base_dir):
+    """
+    Build a ``CACHES`` entry from ``file:///relative/path``,
+    ``redis://host:port/db`` or ``locmem://name``. Query parameters become
+    backend OPTIONS.
+
+    File caches keep Django's default bound of 300 entries. Every write
+    lists the whole directory to decide whether to cull, so a large bound
+    makes every write slow. Culling also reaps keys left under old
+    namespace versions, which are never read again.
+    """
+    parts = urlsplit(url)
+    try:
+        backend = BACKENDS[parts.scheme]
+    except KeyError:
+        raise ValueError(f'Unsupported cache URL scheme: {parts.scheme!r}')
+
+    config = {'BACKEND': backend, 'OPTIONS': dict(parse_qsl(parts.query))}
+    if parts.scheme == 'file':
+        path = unquote(parts.path)[1:] if parts.path.startswith('/') else unquote(parts.path)
+        config['LOCATION'] = str(path if path.startswith('/') else f'{base_dir}/{path}')
+    elif parts.scheme in ('redis', 'rediss'):
+        config['LOCATION'] = parts._replace(query='').geturl()
+    elif parts.scheme == 'locmem':
+        config['LOCATION'] = parts.netloc
+    return config
+
+
+# L1 state is per process and shared by all threads (Django creates a cache
+# instance per thread), keyed by the L2 alias.
+_local_caches = {}
+_local_locks = {}
+_stats = {}
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = location
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 5))
+        self._l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        # Seconds a concurrent miss waits for the caller computing the value
+        self._lock_timeout = float(options.get('LOCK_TIMEOUT', 10))
+        self._l1 = _local_caches.setdefault(location, OrderedDict())
+        self._l1_lock = _local_locks.setdefault(location, threading.Lock())
+        self._stats = _stats.setdefault(location, {'l1_hits': 0, 'l2_hits': 0, 'misses': 0})
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def stats(self):
+        with self._l1_lock:
+            return dict(self._stats, l1_entries=len(self._l1))
+
+    def _timeout(self, timeout):
+        # Resolved to seconds here, both tiers apply their own expiry
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    # L1
+
+    def _l1_get(self, key):
+        with self._l1_lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return False, None
+            expires, pickled = entry
+            if expires < time.monotonic():
+                del self._l1[key]
+                return False, None
+            self._l1.move_to_end(key)
+        return True, pickle.loads(pickled)
+
+    def _l1_set(self, key, value, timeout):
+        l1_timeout = self._l1_timeout if timeout is None else min(timeout, self._l1_timeout)
+        if l1_timeout <= 0:
+            self._l1_delete(key)
+            return
+        # Stored pickled so callers can't mutate the cached object in place
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._l1_lock:
+            self._l1[key] = (time.monotonic() + l1_timeout, pickled)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self._l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_delete(self, key):
+        with self._l1_lock:
+            return self._l1.pop(key, None) is not None
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        tier, value = self._lookup(key, version)
+        with self._l1_lock:
+            self._stats[tier] += 1
+        timings = current_timings()
+        if timings is not None:
+            if tier == 'misses':
+                timings.cache_misses += 1
+            else:
+                timings.cache_hits += 1
+        return default if tier == 'misses' else value
+
+    def _lookup(self, key, version):
+        l1_key = self.make_and_validate_key(key, version=version)
+        found, value = self._l1_get(l1_key)
+        if found:
+            return 'l1_hits', value
+        sentinel = object()
+        value = self.l2.get(key, sentinel, version=version)
+        if value is sentinel:
+            return 'misses', None
+        self._l1_set(l1_key, value, self._l1_timeout)
+        return 'l2_hits', value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        self.l2.set(key, value, timeout, version=version)
+        self._l1_set(self.make_and_validate_key(key, version=version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        if not self.l2.add(key, value, timeout, version=version):
+            return False
+        self._l1_set(self.make_and_validate_key(key, version=version), value, timeout)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, self._timeout(timeout), version=version)
+
+    def delete(self, key, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        found, _ = self._l1_get(self.make_and_validate_key(key, version=version))
+        return found or self.l2.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        # Counters live in L2 only; a cached L1 copy would drift
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.incr(key, delta, version=version)
+
+    def clear(self):
+        with self._l1_lock:
+            self._l1.clear()
+        self.l2.clear()
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        sentinel = object()
+        value = self.get(key, sentinel, version=version)
+        if value is not sentinel:
+            return value
+
+        l1_key = self.make_and_validate_key(key, version=version)
+        with _flights_lock:
+            flight = _flights.setdefault(l1_key, threading.Lock())
+        # One thread per process computes; the others wait on the lock and
+        # then find the value in L1.
+        with flight:
+            try:
+                tier, value = self._lookup(key, version)
+                if tier != 'misses':
+                    return value
+                return self._compute_once(key, default, timeout, version)
+            finally:
+                with _flights_lock:
+                    _flights.pop(l1_key, None)
+
+    def _compute_once(self, key, default, timeout, version):
+        # Across processes, the first to take the L2 lock computes and the
+        # others poll L2 until the value appears or the lock times out.
+        lock_key = f'{key}:lock'
+        if not self.l2.add(lock_key, 1, self._lock_timeout, version=version):
+            deadline = time.monotonic() + self._lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                tier, value = self._lookup(key, version)
+                if tier != 'misses':
+                    return value
+        try:
+            value = default() if callable(default) else default
+            if value is not None:
+                self.set(key, value, timeout, version=version)
+            return value
+        finally:
+            self.l2.delete(lock_key, version=version)
+
+
+def namespaced_key(namespaces, *parts):
+    """
+    Return a key that embeds the current version of each namespace, e.g.
+    ``catalog:1729350000000/cart-12:1729350000003/summary``. Bump a
+    namespace to invalidate every key built from it.
+    """
+    if isinstance(namespaces, str):
+        namespaces = (namespaces,)
+    store = caches[NAMESPACE_CACHE_ALIAS]
+    version_keys = [f'ns:{name}' for name in namespaces]
+    bumped_keys = [f'ns-bumped:{name}' for name in namespaces] if _replicated() else []
+    versions = store.get_many(version_keys + bumped_keys)
+    if any(key in versions for key in bumped_keys):
+        # Whatever this request caches under the new version must not come
+        # from a replica that is still replaying the change
+        pin_to_primary()
+    missing = [key for key in version_keys if key not in versions]
+    if missing:
+        for key in missing:
+            store.add(key, _seed_version(), None)
+        # Another process may have seeded it first
+        versions.update(store.get_many(missing))
+    prefix = '/'.join(f'{name}:{versions.get(key, 0)}' for name, key in zip(namespaces, version_keys))
+    return '/'.join([prefix, *map(str, parts)])
+
+
+def bump_namespace(*namespaces):
+    """Invalidate every key built from ``namespaces`` once the current transaction commits."""
+    transaction.on_commit(lambda: _bump(namespaces))
+
+
+def _bump(namespaces):
+    store = caches[NAMESPACE_CACHE_ALIAS]
+    for name in namespaces:
+        key = f'ns:{name}'
+        # Namespace versions never expire, or keys would silently go back
+        # to an older version.
+        if not store.add(key, _seed_version(), None):
+            try:
+                store.incr(key)
+            except ValueError:
+                store.set(key, _seed_version(), None)
+    if _replicated():
+        store.set_many({f'ns-bumped:{name}': 1 for name in namespaces}, settings.REPLICA_STICKY_SECONDS)
+
+
+def _replicated():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def _seed_version():
+    # Milliseconds: later than any version handed out before, unless a
+    # namespace was bumped more than once per millisecond since it was seeded
+    return time.time_ns() // 1_000_000
+
+
+def cached(namespaces, *parts, compute, timeout=DEFAULT_TIMEOUT):
+    """Single-flight get-or-compute of a namespaced value in the tiered cache."""
+    return caches[TIERED_CACHE_ALIAS].get_or_set(namespaced_key(namespaces, *parts), compute, timeout)
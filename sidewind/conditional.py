@@ -0,0 +1,130 @@
+"""
+HTTP conditional responses for catalog pages.
+
+A visitor with no session cookie is anonymous, with no cart and no flash
+messages, so their product and category pages depend only on the catalog.
+Those responses get ``Last-Modified`` and an ``ETag``. A revalidation runs
+one timestamp query and answers 304 when nothing changed, without running
+the view or rendering the template.
+
+``Last-Modified`` is the newest timestamp the view's validator function
+returns. The ``ETag`` also covers the rest of the page:
+
+- the catalog namespace version, for navigation categories, related
+  products and deletions;
+- ``RELEASE``, for template changes;
+- the visitor's CSRF cookie, because the page's forms embed a token for
+  it.
+
+Pages rendered for the page cache (sidewind/pagecache.py) carry no CSRF
+token. Any anonymous visitor can revalidate them, and their ETag leaves
+the cookie out.
+
+``Vary: Cookie`` stops a page cached before login, or before the visitor
+started a cart, from being reused afterwards. Every other request is
+served as before and marked ``private``.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .cache import namespaced_key
+from .pagecache import caching_page
+
+
+def is_shared_request(request):
+    """True when the page can't depend on who is asking."""
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    return caching_page(request) or (
+        not request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        and not request.COOKIES.get(CookieStorage.cookie_name)
+    )
+
+
+def conditional_page(timestamps):
+    """
+    Serve a catalog view conditionally to anonymous visitors.
+
+    ``timestamps(*args, **kwargs)`` receives the view's URL arguments and
+    returns the ``updated_at`` values the page is built from, or None when
+    the object doesn't exist (the view then raises its 404).
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if not is_shared_request(request):
+                    return _private(await view(request, *args, **kwargs))
+                stamps = await sync_to_async(timestamps)(*args, **kwargs)
+                response = await sync_to_async(_not_modified)(request, stamps)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                    await sync_to_async(_add_validators)(request, response, stamps)
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_shared_request(request):
+                return _private(view(request, *args, **kwargs))
+            stamps = timestamps(*args, **kwargs)
+            response = _not_modified(request, stamps)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                _add_validators(request, response, stamps)
+            return response
+        return wrapper
+    return decorator
+
+
+def _last_modified(stamps):
+    stamps = [stamp for stamp in stamps or () if stamp is not None]
+    return int(max(stamps).timestamp()) if stamps else None
+
+
+def _etag(request, stamps):
+    # The CSRF cookie is read from META: the render sets it there when the
+    # visitor didn't send one
+    csrf_cookie = '' if caching_page(request) else request.META.get('CSRF_COOKIE', '')
+    parts = [
+        settings.RELEASE,
+        namespaced_key('catalog'),
+        *(stamp.isoformat() if stamp else '' for stamp in stamps),
+        csrf_cookie,
+    ]
+    digest = hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _not_modified(request, stamps):
+    if stamps is None or ('CSRF_COOKIE' not in request.META and not caching_page(request)):
+        # Without a CSRF cookie the cached copy's forms would be rejected
+        return None
+    response = get_conditional_response(
+        request, etag=_etag(request, stamps), last_modified=_last_modified(stamps),
+    )
+    if response is not None:
+        _add_validators(request, response, stamps)
+    return response
+
+
+def _add_validators(request, response, stamps):
+    if stamps is None or response.status_code not in (200, 304):
+        return
+    response.headers.setdefault('ETag', _etag(request, stamps))
+    last_modified = _last_modified(stamps)
+    if last_modified is not None:
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+    patch_cache_control(response, private=True, max_age=settings.CATALOG_PAGE_MAX_AGE, must_revalidate=True)
+    patch_vary_headers(response, ['Cookie'])
+
+
+def _private(response):
+    patch_cache_control(response, private=True)
+    return response
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from sidewind.querybudget import SIZES, BudgetError, growth_failures, measure_budgets, uncovered_urls
+
+
+class Command(BaseCommand):
+    help = 'Check that no view runs more queries as the data it shows grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-sql', action='store_true', help='Print query counts for every URL')
+
+    def handle(self, *args, **options):
+        missing = uncovered_urls()
+        if missing:
+            raise CommandError(f'URLs without a query budget check: {", ".join(missing)}')
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            counts, queries = measure_budgets()
+        except BudgetError as exc:
+            raise CommandError(str(exc))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        if options['verbose_sql']:
+            for label, by_size in counts.items():
+                self.stdout.write(f'{label}: ' + ', '.join(str(by_size[size]) for size in SIZES))
+        failures = growth_failures(counts, queries)
+        if failures:
+            raise CommandError('Query counts grow with data size:\n\n' + '\n\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS(f'{len(counts)} URLs run a constant number of queries.'))
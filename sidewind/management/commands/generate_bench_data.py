@@ -0,0 +1,249 @@
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from accounts.models import Profile
+from cart.models import Cart, CartItem
+from orders.models import Order, OrderItem
+from orders.numbering import reserve_order_numbers
+from products.models import Category, Product
+from products.signals import catalog_changed
+from sidewind.benchmark import ADJECTIVES, CATEGORY_NAMES, CITIES, COLORS, FIRST_NAMES, LAST_NAMES, PREFIX
+
+# (status, payment_status, weight)
+ORDER_STATES = [
+    ('delivered', 'paid', 60), ('shipped', 'paid', 10), ('processing', 'paid', 8),
+    ('pending', 'pending', 7), ('cancelled', 'failed', 10), ('cancelled', 'refunded', 5),
+]
+HISTORY_DAYS = 730
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the created_at/updated_at values we assign."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def created_ids(model, objs, unique_field):
+    # Backends that can't return ids from a bulk insert leave pk unset
+    if all(obj.pk for obj in objs):
+        return [obj.pk for obj in objs]
+    keys = [getattr(obj, unique_field) for obj in objs]
+    ids = dict(model.objects.filter(**{f'{unique_field}__in': keys}).values_list(unique_field, 'id'))
+    return [ids[key] for key in keys]
+
+
+class Command(BaseCommand):
+    help = 'Generate a large synthetic catalog, customer base and order history for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--users', type=int, default=50_000)
+        parser.add_argument('--carts', type=int, default=200_000, help='Includes one cart per user')
+        parser.add_argument('--orders', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--flush', action='store_true', help='Delete previously generated data first')
+
+    def handle(self, *args, **options):
+        if options['carts'] < options['users']:
+            raise CommandError('--carts must be at least --users: every customer has a cart.')
+        if not options['flush'] and User.objects.filter(username__startswith=f'{PREFIX}-').exists():
+            raise CommandError('Benchmark data already exists; pass --flush to replace it.')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+
+        if options['flush']:
+            self.step('Flushing previous data', self.flush)
+        with explicit_timestamps(Category, Product, Profile, Cart, CartItem, Order, OrderItem):
+            categories = self.step('Categories', self.create_categories)
+            products = self.step('Products', self.create_products, categories, options['products'])
+            users = self.step('Users', self.create_users, options['users'])
+            carts = self.step('Carts', self.create_carts, users, products, options['carts'])
+            self.step('Orders', self.create_orders, users, carts, products, options['orders'])
+
+        # bulk_create sends no post_save, so invalidate catalog caches here
+        catalog_changed.send(sender=Product, product_ids=[])
+        self.stdout.write(self.style.SUCCESS('Benchmark data generated.'))
+
+    def step(self, label, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        count = f'{len(result):,} ' if result is not None else ''
+        self.stdout.write(f'{label}: {count}in {time.perf_counter() - started:.1f}s')
+        return result
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield range(start, min(start + self.batch_size, total))
+
+    def timestamp(self):
+        return self.now - timedelta(seconds=self.rng.randrange(HISTORY_DAYS * 86400))
+
+    def flush(self):
+        users = User.objects.filter(username__startswith=f'{PREFIX}-')
+        Order.objects.filter(user__in=users).delete()
+        Cart.objects.filter(session_key__startswith=PREFIX).delete()
+        users.delete()
+        Product.objects.filter(slug__startswith=f'{PREFIX}-').delete()
+        Category.objects.filter(slug__startswith=f'{PREFIX}-').delete()
+
+    def create_categories(self):
+        now = self.now
+        categories = Category.objects.bulk_create([
+            Category(name=name, slug=f'{PREFIX}-{slugify(name)}', description=f'{name} for every occasion.',
+                     created_at=now, updated_at=now)
+            for name in CATEGORY_NAMES
+        ])
+        return created_ids(Category, categories, 'slug')
+
+    def create_products(self, category_ids, total):
+        rng = self.rng
+        products = []
+        for batch in self.batches(total):
+            objs = []
+            for index in batch:
+                category = CATEGORY_NAMES[index % len(CATEGORY_NAMES)]
+                name = f'{rng.choice(ADJECTIVES)} {rng.choice(COLORS)} {category.rstrip("s")}'
+                price = Decimal(rng.randrange(1500, 50000)) / 100
+                created = self.timestamp()
+                objs.append(Product(
+                    category_id=category_ids[index % len(category_ids)],
+                    name=name,
+                    slug=f'{PREFIX}-{slugify(name)}-{index}',
+                    description=f'{name}. Cut for everyday wear from carefully sourced materials.',
+                    price=price,
+                    sale_price=(price * Decimal('0.8')).quantize(Decimal('0.01')) if rng.random() < 0.2 else None,
+                    image='products/bench.jpg',
+                    stock=rng.randrange(0, 200),
+                    available=rng.random() < 0.97,
+                    featured=rng.random() < 0.005,
+                    created_at=created,
+                    updated_at=created,
+                ))
+            with transaction.atomic():
+                Product.objects.bulk_create(objs)
+            products.extend(
+                (pk, obj.name, obj.sale_price or obj.price, obj.price)
+                for pk, obj in zip(created_ids(Product, objs, 'slug'), objs)
+            )
+        return products
+
+    def create_users(self, total):
+        rng = self.rng
+        password = make_password(None)
+        users = []
+        for batch in self.batches(total):
+            objs = []
+            for index in batch:
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                objs.append(User(
+                    username=f'{PREFIX}-{index}', email=f'{PREFIX}-{index}@example.com',
+                    first_name=first, last_name=last, password=password,
+                    date_joined=self.now - timedelta(days=HISTORY_DAYS + 1),
+                ))
+            with transaction.atomic():
+                User.objects.bulk_create(objs)
+                ids = created_ids(User, objs, 'username')
+                Profile.objects.bulk_create([
+                    Profile(user_id=pk, created_at=self.now, updated_at=self.now) for pk in ids
+                ])
+            users.extend(zip(ids, objs))
+        return users
+
+    def create_carts(self, users, products, total):
+        rng = self.rng
+        carts = []
+        for batch in self.batches(total):
+            objs = []
+            for index in batch:
+                user_id = users[index][0] if index < len(users) else None
+                session_key = None if user_id else f'{PREFIX}{uuid.UUID(int=rng.getrandbits(128)).hex[:32]}'
+                objs.append(Cart(user_id=user_id, session_key=session_key, created_at=self.now, updated_at=self.now))
+            with transaction.atomic():
+                Cart.objects.bulk_create(objs)
+                ids = [obj.pk for obj in objs] if all(obj.pk for obj in objs) else self._cart_ids(objs)
+                items = []
+                for cart_id in ids:
+                    for product in rng.sample(products, rng.randrange(0, 5)):
+                        items.append(CartItem(
+                            cart_id=cart_id, product_id=product[0], quantity=rng.randrange(1, 4),
+                            created_at=self.now, updated_at=self.now,
+                        ))
+                CartItem.objects.bulk_create(items)
+            carts.extend(ids)
+        return carts
+
+    def _cart_ids(self, objs):
+        # Carts have no single unique column; look them up by owner
+        user_ids = [obj.user_id for obj in objs if obj.user_id]
+        session_keys = [obj.session_key for obj in objs if obj.session_key]
+        by_user = dict(Cart.objects.filter(user_id__in=user_ids).values_list('user_id', 'id'))
+        by_session = dict(Cart.objects.filter(session_key__in=session_keys).values_list('session_key', 'id'))
+        return [by_user[obj.user_id] if obj.user_id else by_session[obj.session_key] for obj in objs]
+
+    def create_orders(self, users, carts, products, total):
+        rng = self.rng
+        states, weights = [state[:2] for state in ORDER_STATES], [state[2] for state in ORDER_STATES]
+        created = 0
+        for batch in self.batches(total):
+            numbers = reserve_order_numbers(len(batch))
+            objs, lines = [], []
+            for number in numbers:
+                user_index = rng.randrange(len(users))
+                user_id, user = users[user_index]
+                city, state, zip_code = rng.choice(CITIES)
+                status, payment_status = rng.choices(states, weights)[0]
+                order_lines = [
+                    (product, rng.randrange(1, 4)) for product in rng.sample(products, rng.randrange(1, 4))
+                ]
+                subtotal = sum(price * quantity for (_, _, price, _), quantity in order_lines)
+                tax = (subtotal * Decimal('0.08')).quantize(Decimal('0.01'))
+                shipping = Decimal('10.00') if subtotal < Decimal('100.00') else Decimal('0.00')
+                placed = self.timestamp()
+                objs.append(Order(
+                    order_number=number, user_id=user_id, cart_id=carts[user_index],
+                    first_name=user.first_name, last_name=user.last_name, email=user.email,
+                    phone='555-0100', address=f'{rng.randrange(1, 9999)} Main St',
+                    city=city, state=state, zip_code=zip_code, country='United States',
+                    subtotal=subtotal, tax=tax, shipping=shipping, total=subtotal + tax + shipping,
+                    stripe_payment_intent=f'pi_{PREFIX}_{number}', payment_status=payment_status, status=status,
+                    created_at=placed, updated_at=placed + timedelta(days=rng.randrange(0, 10)),
+                ))
+                lines.append(order_lines)
+            with transaction.atomic():
+                Order.objects.bulk_create(objs)
+                OrderItem.objects.bulk_create([
+                    OrderItem(order_id=order_id, product_id=product_id, product_name=name,
+                              product_price=price, list_price=list_price, quantity=quantity,
+                              total_price=price * quantity)
+                    for order_id, order_lines in zip(created_ids(Order, objs, 'order_number'), lines)
+                    for (product_id, name, price, list_price), quantity in order_lines
+                ])
+            created += len(objs)
+            if created % (self.batch_size * 20) == 0:
+                self.stdout.write(f'  {created:,} orders')
+        return range(created)
@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from sidewind.sessions.cached_db import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete expired database sessions in small batches (run it from cron instead of clearsessions)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.SESSION_PURGE_BATCH_SIZE,
+                            help='Sessions deleted per statement')
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help='Seconds to sleep between batches, to leave room for live traffic')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches')
+
+    def handle(self, *args, **options):
+        if not settings.SESSION_ENGINE.endswith('db'):
+            # The cache-only engine lets the cache expire sessions itself
+            self.stdout.write(f'{settings.SESSION_ENGINE} keeps no sessions in the database.')
+            return
+
+        now = timezone.now()
+        purged = batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            deleted = purge_expired(options['batch_size'], now)
+            if not deleted:
+                break
+            purged += deleted
+            batches += 1
+            time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} expired sessions'))
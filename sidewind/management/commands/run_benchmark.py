@@ -0,0 +1,83 @@
+import json
+import multiprocessing
+import platform
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from sidewind.benchmark import REGRESSION_THRESHOLD, SCENARIOS, summarize, worker
+
+
+class Command(BaseCommand):
+    help = 'Drive the storefront with parallel simulated shoppers and report latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count())
+        parser.add_argument('--duration', type=float, default=60, help='Measured seconds per process')
+        parser.add_argument('--warmup', type=float, default=5, help='Unmeasured seconds per process')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--compare', help='Baseline JSON report to compare against')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        # Workers open their own connections; don't hand them ours
+        connection.close()
+        context = multiprocessing.get_context('spawn')
+        queue = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(i, options['warmup'], options['duration'], queue))
+            for i in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        elapsed = options['duration']
+        merged = {name: [s for result in results for s in result[name]] for name, _ in SCENARIOS}
+        report = {
+            'meta': {
+                'processes': options['processes'], 'duration': elapsed,
+                'database': connection.vendor, 'python': platform.python_version(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            },
+            'total': summarize([s for samples in merged.values() for s in samples], elapsed),
+            'scenarios': {name: summarize(samples, elapsed) for name, samples in merged.items()},
+        }
+
+        self.print_report(report, baseline)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
+
+    def print_report(self, report, baseline):
+        columns = ['requests', 'throughput', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request']
+        self.stdout.write(f'{"scenario":<16}' + ''.join(f'{c:>22}' for c in columns))
+        rows = [('total', report['total']), *report['scenarios'].items()]
+        regressions = []
+        for name, stats in rows:
+            previous = None
+            if baseline:
+                previous = baseline['total'] if name == 'total' else baseline['scenarios'].get(name)
+            cells = []
+            for column in columns:
+                value, delta = stats[column], ''
+                if previous and column != 'requests' and value is not None and previous.get(column):
+                    change = (value - previous[column]) / previous[column]
+                    delta = f' ({change:+.0%})'
+                    worse = -change if column == 'throughput' else change
+                    if column in ('throughput', 'p95_ms') and worse > REGRESSION_THRESHOLD:
+                        regressions.append(f'{name} {column}')
+                cells.append(f'{"-" if value is None else value}{delta}'.rjust(22))
+            self.stdout.write(f'{name:<16}' + ''.join(cells))
+        if report['total']['errors']:
+            self.stdout.write(self.style.ERROR(f'{report["total"]["errors"]} requests failed with 5xx'))
+        if regressions:
+            self.stdout.write(self.style.WARNING('Regressions: ' + ', '.join(regressions)))
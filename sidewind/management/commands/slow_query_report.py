@@ -0,0 +1,75 @@
+import json
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Summarize the slow-query log: the statements and code sites that cost the most database time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=None, help='Defaults to SLOW_QUERY_LOG')
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--hours', type=float, default=None, help='Only entries from the last N hours')
+        parser.add_argument('--by', choices=['site', 'shape', 'view'], default='site',
+                            help='Group by code site (with statement), statement shape or view')
+        parser.add_argument('--sort', choices=['total', 'count', 'max'], default='total')
+        parser.add_argument('--explain', action='store_true', help='Print the latest plan for each entry')
+
+    def handle(self, *args, **options):
+        path = options['log'] or settings.SLOW_QUERY_LOG
+        since = time.time() - options['hours'] * 3600 if options['hours'] else 0
+        groups = defaultdict(lambda: {'durations': [], 'views': set(), 'sql': None, 'explain': None, 'code': None})
+        try:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry['time'] < since:
+                        continue
+                    group = groups[self.group_key(entry, options['by'])]
+                    group['durations'].append(entry['ms'])
+                    group['views'].add(entry.get('view') or '-')
+                    group['sql'] = entry['sql']
+                    group['code'] = entry.get('code')
+                    group['explain'] = entry.get('explain') or group['explain']
+        except FileNotFoundError:
+            raise CommandError(f'No slow-query log at {path}')
+
+        if not groups:
+            self.stdout.write('No slow queries logged.')
+            return
+
+        sort_key = {
+            'total': lambda item: sum(item[1]['durations']),
+            'count': lambda item: len(item[1]['durations']),
+            'max': lambda item: max(item[1]['durations']),
+        }[options['sort']]
+        ranked = sorted(groups.items(), key=sort_key, reverse=True)[:options['top']]
+        for rank, (key, group) in enumerate(ranked, 1):
+            durations = sorted(group['durations'])
+            p95 = durations[min(len(durations) - 1, int(0.95 * len(durations)))]
+            self.stdout.write(self.style.MIGRATE_HEADING(f'#{rank} {key}'))
+            self.stdout.write(
+                f'  {len(durations)} queries, {sum(durations):.0f} ms total, '
+                f'mean {sum(durations) / len(durations):.1f} ms, p95 {p95:.1f} ms, max {durations[-1]:.1f} ms'
+            )
+            self.stdout.write(f'  views: {", ".join(sorted(group["views"]))}')
+            if group['code']:
+                self.stdout.write(f'  code: {group["code"]}')
+            self.stdout.write(f'  sql: {group["sql"][:500]}')
+            if options['explain'] and group['explain']:
+                self.stdout.write('  plan:')
+                for plan_line in group['explain'].splitlines():
+                    self.stdout.write(f'    {plan_line}')
+
+    def group_key(self, entry, by):
+        if by == 'shape':
+            return entry['shape']
+        if by == 'view':
+            return entry.get('view') or '-'
+        return f'{entry.get("site") or "unknown site"} {entry["shape"][:80]}'
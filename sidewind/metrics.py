@@ -0,0 +1,68 @@
+"""
+Prometheus metrics.
+
+Under gunicorn each worker writes its samples to files in
+``PROMETHEUS_MULTIPROC_DIR`` (set up in gunicorn.conf.py) and the metrics
+view aggregates them, so every scrape sees the whole node whichever worker
+answers it. Without that variable, as under runserver, the process-local
+registry is served.
+"""
+import hmac
+import os
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+REQUEST_LATENCY = Histogram(
+    'sidewind_request_duration_seconds', 'Request latency by URL name',
+    ['view', 'method'],
+)
+REQUEST_QUERIES = Histogram(
+    'sidewind_request_queries', 'Database queries per request by URL name',
+    ['view'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, float('inf')),
+)
+
+# Storefront funnel
+CART_ADDS = Counter('sidewind_cart_adds', 'Products added to a cart')
+CHECKOUTS_STARTED = Counter('sidewind_checkouts_started', 'Checkout forms shown for a non-empty cart')
+PAYMENT_INTENTS_CREATED = Counter('sidewind_payment_intents_created', 'Stripe payment intents created at checkout')
+WEBHOOKS_PROCESSED = Counter(
+    'sidewind_webhooks_processed', 'Stripe webhooks received, by event type and result',
+    ['event', 'result'],
+)
+
+# Event types payment_webhook acts on; others are counted as "other" to
+# keep label values bounded
+WEBHOOK_EVENTS = ('payment_intent.succeeded', 'payment_intent.payment_failed')
+
+
+def observe_request(request, timings):
+    match = request.resolver_match
+    # URL names are a fixed set; unresolved paths would be unbounded
+    view = match.url_name if match and match.url_name else 'unresolved'
+    REQUEST_LATENCY.labels(view, request.method).observe(timings.total_time)
+    REQUEST_QUERIES.labels(view).observe(timings.queries)
+
+
+def record_webhook(event_type, result):
+    WEBHOOKS_PROCESSED.labels(event_type if event_type in WEBHOOK_EVENTS else 'other', result).inc()
+
+
+def metrics(request):
+    # Scrapers authenticate with METRICS_TOKEN; without one the endpoint
+    # only exists in development
+    token = settings.METRICS_TOKEN
+    if not token and not settings.DEBUG:
+        raise Http404
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,235 @@
+"""
+Project middleware.
+
+Each class here supports both WSGI and ASGI: under ASGI a sync-only
+middleware makes Django run the rest of the chain, async views included,
+through a thread for every request.
+"""
+import json
+import logging
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .metrics import observe_request
+from .pagecache import get_cached_page, page_cache_key, store_page
+from .profiling import may_profile, profile_request, profile_thread, requested_token, save_profile
+from .timing import timing
+
+timing_logger = logging.getLogger('sidewind.timing')
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise, with an async path for requests that aren't static files."""
+
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class MetricsMiddleware:
+    """
+    Record every request's latency and query count in the Prometheus
+    histograms. That needs ``timing()`` on every request, so the
+    instrumentation cost is paid whatever REQUEST_TIMING_SAMPLE_RATE is;
+    the sample rate only limits the header and log line. Place it right
+    after RequestTimingMiddleware, whose timing it joins when sampled.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with timing(request) as timings:
+            response = self.get_response(request)
+        observe_request(request, timings)
+        return response
+
+    async def __acall__(self, request):
+        with timing(request) as timings:
+            response = await self.get_response(request)
+        observe_request(request, timings)
+        return response
+
+
+class RequestTimingMiddleware:
+    """
+    Time a sample of requests (REQUEST_TIMING_SAMPLE_RATE) and report where
+    the time went, as a Server-Timing header and a JSON log line. Keep it
+    first in MIDDLEWARE so the total covers the whole stack, metrics
+    included.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.REQUEST_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        with timing(request) as timings:
+            response = self.get_response(request)
+        return self._report(request, response, timings)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.REQUEST_TIMING_SAMPLE_RATE:
+            return await self.get_response(request)
+        with timing(request) as timings:
+            response = await self.get_response(request)
+        return self._report(request, response, timings)
+
+    def _report(self, request, response, timings):
+        total = timings.total_time * 1000
+        db = timings.db_time * 1000
+        template = timings.template_time * 1000
+        context_processors = timings.context_processor_time * 1000
+        match = request.resolver_match
+
+        if settings.REQUEST_TIMING_HEADER:
+            response['Server-Timing'] = ', '.join([
+                f'total;dur={total:.1f}',
+                f'db;dur={db:.1f};desc="{timings.queries} queries"',
+                f'ctx;dur={context_processors:.1f};desc="context processors"',
+                f'tpl;dur={template:.1f};desc="templates"',
+                f'cache;desc="{timings.cache_hits} hits, {timings.cache_misses} misses"',
+            ])
+        timing_logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total, 1),
+            'db_ms': round(db, 1),
+            'queries': timings.queries,
+            'context_processors_ms': round(context_processors, 1),
+            'templates_ms': round(template, 1),
+            'cache_hits': timings.cache_hits,
+            'cache_misses': timings.cache_misses,
+        }))
+        return response
+
+
+class RequestProfilingMiddleware:
+    """
+    Run a request under cProfile when a staff user asks for it with a
+    signed token (see sidewind/profiling.py), and store the profile. Place
+    it after AuthenticationMiddleware.
+
+    cProfile only sees the thread it was enabled on. Under ASGI that is the
+    event loop, which runs async views and middleware but none of a sync
+    view's code, so ``process_view`` profiles sync views in the worker
+    thread that runs them and the two profiles are merged. Sync middleware
+    and other threads the view starts aren't covered. The event-loop
+    profile also includes other requests' coroutines; profile on a quiet
+    worker.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = requested_token(request)
+        if not token or not may_profile(request, token):
+            return self.get_response(request)
+        with profile_request() as result:
+            response = self.get_response(request)
+        profile = save_profile(request, response, result)
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+    async def __acall__(self, request):
+        token = requested_token(request)
+        if not token or not await sync_to_async(may_profile)(request, token):
+            return await self.get_response(request)
+        with profile_request() as result:
+            request.profile_result = result
+            response = await self.get_response(request)
+        profile = await sync_to_async(save_profile)(request, response, result)
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Only set under ASGI, where Django calls this (and a sync view)
+        # from a worker thread the event-loop profiler can't see
+        result = getattr(request, 'profile_result', None)
+        if result is None or iscoroutinefunction(view_func):
+            return None
+        with profile_thread(result):
+            return view_func(request, *view_args, **view_kwargs)
+
+
+class PageCacheMiddleware:
+    """
+    Serve anonymous catalog pages from the page cache (see
+    sidewind/pagecache.py). Place it after AuthenticationMiddleware and
+    before MessageMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.page_cache_key = key = page_cache_key(request)
+        if key is None:
+            return self.get_response(request)
+        response = get_cached_page(request, key)
+        if response is None:
+            response = self.get_response(request)
+            store_page(request, key, response)
+        return response
+
+    async def __acall__(self, request):
+        request.page_cache_key = key = await sync_to_async(page_cache_key)(request)
+        if key is None:
+            return await self.get_response(request)
+        response = await sync_to_async(get_cached_page)(request, key)
+        if response is None:
+            response = await self.get_response(request)
+            await sync_to_async(store_page)(request, key, response)
+        return response
@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.db import models
+
+# Imported for its connection_created receiver
+from . import slowqueries  # noqa: F401
+
+
+class RequestProfile(models.Model):
+    """A cProfile run of one request, captured by RequestProfilingMiddleware."""
+
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2000)
+    view_name = models.CharField(max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    db_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    template_ms = models.FloatField()
+    # [{"sql": ..., "ms": ...}] in execution order, and the same for templates
+    queries = models.JSONField(default=list)
+    templates = models.JSONField(default=list)
+    # Top functions by cumulative time, and the raw stats in the format
+    # cProfile writes (open with pstats or snakeviz)
+    summary = models.TextField()
+    stats = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms:.0f} ms)'
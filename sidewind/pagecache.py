@@ -0,0 +1,115 @@
+"""
+Full-page cache for anonymous catalog traffic.
+
+``PageCacheMiddleware`` serves the views in ``PAGE_CACHE_VIEWS`` from the
+tiered cache to visitors who aren't signed in and have no flash messages
+waiting. Keys are built from the path and the query parameters the view
+reads, under the ``catalog`` namespace. Every catalog change signal
+therefore invalidates every cached page at once. Tracking parameters are
+ignored. A request carrying any other parameter isn't cached, so junk
+query strings can't fill the cache with copies of a page.
+``PAGE_CACHE_TIMEOUT`` bounds how long a page survives otherwise.
+
+A page rendered for the cache can't carry anything personal. While it
+renders, ``caching_page`` is true. The cart context processor then leaves
+the badge empty, and ``page_cache`` blanks the CSRF token. The browser
+fills in both from ``cart_status`` (static/js/main.js).
+
+Responses are stored as they leave the view, inside the session and CSRF
+middleware, so those layers' cookies are never stored. A response that
+sets a cookie itself, or modifies the session, isn't stored either.
+"""
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.messages.storage.session import SessionStorage
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+
+from .cache import TIERED_CACHE_ALIAS, namespaced_key
+
+# Query parameters that never change the page
+IGNORED_PARAMS = {'gclid', 'fbclid', 'msclkid'}
+IGNORED_PARAM_PREFIXES = ('utm_',)
+# Per-response headers added by the middleware around the view
+UNCACHED_HEADERS = {'server-timing', 'x-profile-id'}
+
+
+def caching_page(request):
+    """True while rendering a response that will be shared through the page cache."""
+    return getattr(request, 'page_cache_key', None) is not None
+
+
+def page_cache(request):
+    """Context processor: no CSRF token in shared pages."""
+    if not caching_page(request):
+        return {}
+    # 'NOTPROVIDED' makes {% csrf_token %} render nothing without a warning
+    return {'cached_page': True, 'csrf_token': 'NOTPROVIDED'}
+
+
+def normalized_url(request, allowed):
+    """
+    The path with the parameters in ``allowed`` (last value wins, as the
+    views read them), or None if the request has any other parameter.
+    """
+    unknown = {
+        name for name in request.GET
+        if name not in allowed and name not in IGNORED_PARAMS and not name.startswith(IGNORED_PARAM_PREFIXES)
+    }
+    if unknown or not request.GET.get('page', '1').isdigit():
+        return None
+    params = sorted((name, request.GET[name]) for name in allowed if name in request.GET)
+    return f'{request.path}?{urlencode(params)}'
+
+
+def page_cache_key(request):
+    """The key this request's page is cached under, or None if it can't be shared."""
+    if request.method != 'GET' or not settings.PAGE_CACHE_TIMEOUT:
+        return None
+    try:
+        match = resolve(request.path_info, getattr(request, 'urlconf', None))
+    except Resolver404:
+        return None
+    allowed = settings.PAGE_CACHE_VIEWS.get(match.url_name)
+    if allowed is None or request.COOKIES.get(CookieStorage.cookie_name):
+        return None
+    url = normalized_url(request, allowed)
+    if url is None:
+        return None
+    if request.COOKIES.get(settings.SESSION_COOKIE_NAME):
+        # A cache read with the cached session engines
+        if request.user.is_authenticated or SessionStorage.session_key in request.session:
+            return None
+    digest = hashlib.md5(url.encode(), usedforsecurity=False).hexdigest()
+    return namespaced_key('catalog', 'page', digest)
+
+
+def get_cached_page(request, key):
+    entry = caches[TIERED_CACHE_ALIAS].get(key)
+    if entry is None:
+        return None
+    status, headers, content = entry
+    response = HttpResponse(content, status=status)
+    for name, value in headers:
+        response.headers[name] = value
+    patch_vary_headers(response, ['Cookie'])
+    # Revalidations are answered from the stored validators
+    return get_conditional_response(
+        request, etag=response.headers.get('ETag'),
+        last_modified=parse_http_date_safe(response.headers.get('Last-Modified', '')), response=response,
+    )
+
+
+def store_page(request, key, response):
+    session = getattr(request, 'session', None)
+    if (response.status_code != 200 or response.streaming or response.cookies
+            or (session is not None and session.modified)):
+        return
+    headers = [(name, value) for name, value in response.headers.items() if name.lower() not in UNCACHED_HEADERS]
+    caches[TIERED_CACHE_ALIAS].set(key, (response.status_code, headers, response.content), settings.PAGE_CACHE_TIMEOUT)
@@ -0,0 +1,48 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+# Below this many rows an exact COUNT is cheap enough to keep
+ESTIMATE_THRESHOLD = 100_000
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that trusts PostgreSQL's row estimate for unfiltered tables.
+
+    An exact COUNT(*) over a large table is a full scan on every changelist
+    page. When nothing filters the queryset, the planner's ``reltuples``
+    estimate is close enough for page links; filtered querysets and other
+    databases fall back to the exact count.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            connection = connections[queryset.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                        [queryset.model._meta.db_table],
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] >= ESTIMATE_THRESHOLD:
+                    return row[0]
+        return super().count
+
+
+def id_batches(queryset, batch_size):
+    """Yield the primary keys of ``queryset`` in ascending lists of up to ``batch_size``."""
+    # Keyset over the primary key, so no cursor stays open across updates
+    last = None
+    while True:
+        batch = queryset.order_by('pk')
+        if last is not None:
+            batch = batch.filter(pk__gt=last)
+        ids = list(batch.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
@@ -0,0 +1,122 @@
+"""
+On-demand request profiling.
+
+A staff user gets a signed token from the Request profiles admin page and
+adds it to a request, as ``?_profile=<token>`` or an ``X-Profile-Token``
+header. ``RequestProfilingMiddleware`` (sidewind/middleware.py) then runs
+that one request under cProfile and stores a ``RequestProfile`` with the
+SQL and template timings of the request, which staff can download from the
+admin.
+
+Requests without a token pay for one string search of the query string
+and one header lookup. The token alone is not enough: it must have been
+issued to the staff user the request is authenticated as.
+"""
+import cProfile
+import io
+import marshal
+import pstats
+from contextlib import contextmanager
+from time import perf_counter
+
+from django.conf import settings
+from django.core import signing
+
+from .timing import timing
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE_TOKEN'
+# Cap on stored queries, so a runaway page doesn't make a huge row
+MAX_LOGGED_QUERIES = 1000
+
+_signer = signing.TimestampSigner(salt='sidewind.profiling')
+
+
+def make_profile_token(user):
+    return _signer.sign(str(user.pk))
+
+
+def requested_token(request):
+    if PROFILE_PARAM in request.META.get('QUERY_STRING', ''):
+        return request.GET.get(PROFILE_PARAM)
+    return request.META.get(PROFILE_HEADER)
+
+
+def may_profile(request, token):
+    try:
+        user_id = _signer.unsign(token, max_age=settings.REQUEST_PROFILE_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    user = request.user
+    return user.is_active and user.is_staff and str(user.pk) == user_id
+
+
+@contextmanager
+def profile_request():
+    """
+    Profile the enclosed code. Yields a dict that holds the profiler and
+    the request's timing detail once the block exits.
+    """
+    result = {'thread_profilers': []}
+    with timing() as timings:
+        # Joined timings may already count middleware that ran earlier
+        db_time, queries, template_time = timings.db_time, timings.queries, timings.template_time
+        timings.query_log, timings.template_log = [], []
+        profiler = cProfile.Profile()
+        start = perf_counter()
+        profiler.enable()
+        try:
+            yield result
+        finally:
+            profiler.disable()
+            result.update(
+                profiler=profiler,
+                duration=perf_counter() - start,
+                db_time=timings.db_time - db_time,
+                queries=timings.queries - queries,
+                template_time=timings.template_time - template_time,
+                query_log=timings.query_log,
+                template_log=timings.template_log,
+            )
+            timings.query_log = timings.template_log = None
+
+
+@contextmanager
+def profile_thread(result):
+    """Profile the enclosed code on this thread too, into ``result`` from ``profile_request``."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        result['thread_profilers'].append(profiler)
+
+
+def save_profile(request, response, result):
+    from .models import RequestProfile
+
+    summary = io.StringIO()
+    stats = pstats.Stats(result['profiler'], stream=summary)
+    for profiler in result['thread_profilers']:
+        stats.add(profiler)
+    stats.sort_stats('cumulative').print_stats(50)
+    match = request.resolver_match
+    params = request.GET.copy()
+    params.pop(PROFILE_PARAM, None)
+    query = params.urlencode()
+    return RequestProfile.objects.create(
+        user=request.user,
+        method=request.method,
+        path=(f'{request.path}?{query}' if query else request.path)[:2000],
+        view_name=match.view_name if match else '',
+        status_code=response.status_code,
+        duration_ms=result['duration'] * 1000,
+        db_ms=result['db_time'] * 1000,
+        query_count=result['queries'],
+        template_ms=result['template_time'] * 1000,
+        queries=[{'sql': sql, 'ms': round(elapsed * 1000, 3)} for sql, elapsed in result['query_log'][:MAX_LOGGED_QUERIES]],
+        templates=[{'name': name, 'ms': round(elapsed * 1000, 3)} for name, elapsed in result['template_log']],
+        summary=summary.getvalue(),
+        stats=marshal.dumps(stats.stats),
+    )
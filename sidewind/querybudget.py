@@ -0,0 +1,280 @@
+"""
+Query-count budgets.
+
+``check_query_budgets`` renders every storefront URL (and every admin
+changelist and change form) against fixtures of increasing size and
+requires each one to run the same number of queries whatever the size. A
+view whose count grows with the data has an N+1 somewhere; the report
+names the repeated statement and the application frames that issued it.
+
+Caches are swapped for dummies while measuring so a cached page can't
+hide the queries behind it.
+
+``measure_budgets`` runs inside whatever test database is active, so the
+same check runs from the command and from ``manage.py test``
+(sidewind/tests.py).
+"""
+import re
+import traceback
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+
+# Frames from these files are never the cause of a query
+_IGNORED_FRAMES = (Path(__file__).name, 'timing.py', 'slowqueries.py')
+_IN_LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_SAVEPOINT_RE = re.compile(r'"s\d+_x\d+"')
+
+SIZES = (1, 10, 100)
+# Apps whose every URL must be covered by CHECKS or UNCHECKED
+CHECKED_APPS = ('products', 'cart', 'orders', 'accounts')
+
+CHECKOUT_FORM = {
+    'first_name': 'Budget', 'last_name': 'Customer', 'email': 'budget@example.com', 'phone': '555-0100',
+    'address': '1 Main St', 'city': 'Austin', 'state': 'TX', 'zip_code': '78701', 'country': 'United States',
+    'idempotency_key': 'b' * 32,
+}
+
+
+def _today(fixtures):
+    from django.utils import timezone
+
+    return {'start': timezone.localdate().isoformat(), 'end': timezone.localdate().isoformat()}
+
+
+# (label, method, url name, kwargs, data); kwargs and data take the fixtures
+CHECKS = [
+    ('home', 'get', 'home', None, None),
+    ('product_list', 'get', 'product_list', None, None),
+    ('product_detail', 'get', 'product_detail', lambda f: {'slug': f['product'].slug}, None),
+    ('category_detail', 'get', 'category_detail', lambda f: {'slug': f['category'].slug}, None),
+    ('register', 'get', 'register', None, None),
+    ('login', 'get', 'login', None, None),
+    ('profile', 'get', 'profile', None, None),
+    ('cart_detail', 'get', 'cart_detail', None, None),
+    ('checkout', 'get', 'checkout', None, None),
+    ('order_list', 'get', 'order_list', None, None),
+    ('order_detail', 'get', 'order_detail', lambda f: {'order_id': f['order'].pk}, None),
+    ('payment_success', 'get', 'payment_success', None,
+     lambda f: {'payment_intent': f['order'].stripe_payment_intent}),
+    ('payment_cancel', 'get', 'payment_cancel', None, None),
+    ('export_orders', 'get', 'export_orders', None, _today),
+    ('add_to_cart', 'post', 'add_to_cart', lambda f: {'product_id': f['product'].pk}, lambda f: {'quantity': 1}),
+    ('update_cart', 'post', 'update_cart', lambda f: {'item_id': f['item'].pk}, lambda f: {'quantity': 3}),
+    ('remove_from_cart', 'post', 'remove_from_cart', lambda f: {'item_id': f['item'].pk}, None),
+    ('clear_cart', 'post', 'clear_cart', None, None),
+    ('cart_status', 'get', 'cart_status', None, None),
+    ('checkout (submit)', 'post', 'checkout', None, lambda f: CHECKOUT_FORM),
+    ('logout', 'post', 'logout', None, None),
+]
+UNCHECKED = {
+    'payment_webhook': 'needs a Stripe-signed event',
+}
+
+
+class BudgetError(Exception):
+    pass
+
+
+class RecordedQuery:
+    def __init__(self, alias, sql, stack):
+        self.alias = alias
+        self.sql = sql
+        self.stack = stack
+
+    @property
+    def shape(self):
+        return query_shape(self.sql)
+
+
+def query_shape(sql):
+    """The statement with literals and IN lists folded, for grouping."""
+    sql = _SAVEPOINT_RE.sub('"savepoint"', sql)
+    return _NUMBER_RE.sub('N', _IN_LIST_RE.sub('(...)', sql))
+
+
+def app_frames(limit=8):
+    """The innermost frames of the current stack that belong to the project."""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-1]
+        if frame.filename.startswith(base_dir)
+        and 'site-packages' not in frame.filename
+        and Path(frame.filename).name not in _IGNORED_FRAMES
+    ]
+    return frames[-limit:]
+
+
+@contextmanager
+def record_queries():
+    """Record every query run on any connection, with the stack that ran it."""
+    queries = []
+
+    def wrapper(alias):
+        def record(execute, sql, params, many, context):
+            queries.append(RecordedQuery(alias, sql, app_frames()))
+            return execute(sql, params, many, context)
+        return record
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper(connection.alias)))
+        yield queries
+
+
+def explain_growth(url, counts, smallest, largest):
+    """
+    Describe a URL whose query count grows: the statements that ran more
+    often against the largest fixtures than the smallest, and where from.
+    """
+    lines = [f'{url}: ' + ', '.join(f'{counts[size]} queries with {size} items' for size in sorted(counts))]
+    before = Counter(query.shape for query in smallest)
+    after = Counter(query.shape for query in largest)
+    for shape, count in after.most_common():
+        if count <= before[shape]:
+            continue
+        lines.append(f'  {before[shape]} -> {count}x {shape}')
+        first = next(query for query in largest if query.shape == shape)
+        lines.extend('    ' + line for line in ''.join(traceback.format_list(first.stack)).splitlines())
+    return '\n'.join(lines)
+
+
+def create_fixtures(size):
+    """
+    A staff customer with ``size`` products in their cart, ``size`` orders
+    (the first with ``size`` lines) and ``size`` product images, plus the
+    URLs that exercise them.
+    """
+    from django.contrib.auth.models import User
+
+    from cart.models import Cart, CartItem
+    from orders.models import Order, OrderItem
+    from products.models import Category, Product, ProductImage
+
+    user = User.objects.create_superuser(f'budget-{size}', f'budget-{size}@example.com', 'budget')
+    category = Category.objects.create(name=f'Budget {size}', slug=f'budget-{size}')
+    products = Product.objects.bulk_create([
+        Product(
+            category=category, name=f'Budget product {i}', slug=f'budget-{size}-{i}',
+            description='Budget fixture', price=Decimal('25.00'),
+            sale_price=Decimal('20.00') if i % 2 else None, image='products/budget.jpg', stock=100,
+        )
+        for i in range(size)
+    ])
+    ProductImage.objects.bulk_create([
+        ProductImage(product=products[0], image='products/budget.jpg', alt_text=f'View {i}', is_primary=not i)
+        for i in range(size)
+    ])
+    cart = Cart.objects.create(user=user)
+    items = CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=2) for product in products])
+    orders = []
+    for i in range(size):
+        order = Order.objects.create(
+            user=user, cart=cart, first_name='Budget', last_name='Customer', email=user.email,
+            phone='555-0100', address='1 Main St', city='Austin', state='TX', zip_code='78701',
+            country='United States', subtotal=Decimal('25.00'), tax=Decimal('2.00'),
+            shipping=Decimal('10.00'), total=Decimal('37.00'), stripe_payment_intent=f'pi_budget_{size}_{i}',
+        )
+        lines = products if i == 0 else products[:1]
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, product_name=product.name, product_price=product.price,
+                      quantity=1, total_price=product.price)
+            for product in lines
+        ])
+        orders.append(order)
+    return {
+        'user': user, 'category': category, 'product': products[0], 'item': items[0], 'order': orders[0],
+    }
+
+
+def uncovered_urls():
+    """Names of URLs in ``CHECKED_APPS`` that no check covers."""
+    from django.urls import URLResolver, get_resolver
+
+    names = set()
+    for pattern in get_resolver().url_patterns:
+        if isinstance(pattern, URLResolver) and str(pattern.urlconf_name).split('.')[0] in CHECKED_APPS:
+            names.update(p.name for p in pattern.url_patterns if p.name)
+    return sorted(names - {name for _, _, name, _, _ in CHECKS} - set(UNCHECKED))
+
+
+def measure_budgets():
+    """
+    Query counts and recorded queries per URL label and fixture size, e.g.
+    ``counts['home'] == {1: 9, 10: 9, 100: 9}``. Needs a test database.
+    """
+    from unittest import mock
+
+    from django.test import Client
+    from django.test.utils import override_settings
+
+    from .benchmark import fake_payment_intent
+
+    counts, recorded = {}, {}
+    # Dummy caches: a warm cache would hide the queries behind a page
+    dummy = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    caches = {alias: dummy for alias in settings.CACHES}
+    with override_settings(CACHES=caches, ALLOWED_HOSTS=['testserver'], REQUEST_TIMING_SAMPLE_RATE=0), \
+            mock.patch('stripe.PaymentIntent.create', fake_payment_intent):
+        for size in SIZES:
+            with transaction.atomic():
+                fixtures = create_fixtures(size)
+                client = Client(raise_request_exception=False)
+                client.force_login(fixtures['user'])
+                for label, method, url in _requests(fixtures):
+                    for _ in range(2):
+                        # The first request warms per-process state
+                        # (content types, permissions, site)
+                        count, queries = _run(client, method, url)
+                    counts.setdefault(label, {})[size] = count
+                    recorded.setdefault(label, {})[size] = queries
+                transaction.set_rollback(True)
+    return counts, recorded
+
+
+def growth_failures(counts, queries):
+    """An ``explain_growth`` report for every URL whose count isn't constant."""
+    return [
+        explain_growth(label, by_size, queries[label][SIZES[0]], queries[label][SIZES[-1]])
+        for label, by_size in counts.items()
+        if len(set(by_size.values())) > 1
+    ]
+
+
+def _requests(fixtures):
+    from django.contrib import admin
+    from django.urls import reverse
+
+    for label, method, name, kwargs, data in CHECKS:
+        url = reverse(name, kwargs=kwargs(fixtures) if kwargs else None)
+        yield label, method, (url, data(fixtures) if data else None)
+    for model in admin.site._registry:
+        opts = model._meta
+        prefix = f'admin:{opts.app_label}_{opts.model_name}'
+        yield f'{prefix}_changelist', 'get', (reverse(f'{prefix}_changelist'), None)
+        obj = model._default_manager.order_by('pk').first()
+        if obj is not None:
+            yield f'{prefix}_change', 'get', (reverse(f'{prefix}_change', args=[obj.pk]), None)
+
+
+def _run(client, method, url):
+    from http.cookies import SimpleCookie
+
+    path, data = url
+    # Every request starts from the same fixtures and session
+    cookies = {name: morsel.value for name, morsel in client.cookies.items()}
+    with transaction.atomic():
+        with record_queries() as queries:
+            response = getattr(client, method)(path, data)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        transaction.set_rollback(True)
+    client.cookies = SimpleCookie(cookies)
+    if response.status_code >= 500:
+        raise BudgetError(f'{method.upper()} {path} failed with {response.status_code}')
+    return len(queries), queries
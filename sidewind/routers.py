@@ -0,0 +1,102 @@
+"""
+Primary/replica database routing.
+
+Catalog reads go to the ``replica`` alias when one is configured; every
+write, and every read from other apps (carts, orders, accounts), uses the
+primary. After a write the client is pinned to the primary for
+``REPLICA_STICKY_SECONDS`` so it reads its own changes despite replica lag.
+"""
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http.request import HttpRequest
+
+REPLICA_DB_ALIAS = 'replica'
+PIN_COOKIE = 'pin_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_pinned = ContextVar('pinned_to_primary', default=False)
+
+
+def pinned_to_primary():
+    return _pinned.get()
+
+
+def pin_to_primary():
+    """Send the rest of this request's reads to the primary."""
+    # ReplicaPinningMiddleware restores the previous value when the request ends
+    if REPLICA_DB_ALIAS in settings.DATABASES:
+        _pinned.set(True)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            model._meta.app_label in settings.REPLICA_READ_APPS
+            and REPLICA_DB_ALIAS in settings.DATABASES
+            and not _pinned.get()
+            # Reads inside a write transaction must see its own changes
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaPinningMiddleware:
+    """Route a request's reads to the primary after the client wrote something."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if REPLICA_DB_ALIAS not in settings.DATABASES:
+            # Without a replica every read is on the primary; don't set a
+            # cookie on every unsafe request for nothing
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self._pin(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self._set_cookie(request, response)
+
+    async def __acall__(self, request: HttpRequest):
+        token = self._pin(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self._set_cookie(request, response)
+
+    def _pin(self, request):
+        return _pinned.set(request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES)
+
+    def _set_cookie(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,49 @@
+"""
+Session engines that skip redundant writes.
+
+Point SESSION_ENGINE at ``sidewind.sessions.cached_db`` (reads served from
+the shared cache, writes go to both the cache and the database) or
+``sidewind.sessions.cache`` (cache only: faster, but sessions are lost if
+the cache is flushed or evicts them, so it refuses the file backend).
+Sessions use their own cache alias, so cached pages can't evict them.
+
+Both only write a session whose data changed since it was loaded. If only
+the expiry would move, as with SESSION_SAVE_EVERY_REQUEST, they write at
+most once per SESSION_REFRESH_INTERVAL. That time is kept in the session
+itself, so the stored expiry lags the cookie by at most that interval.
+"""
+import time
+
+from django.conf import settings
+
+# Session key holding when the session was last written
+WRITTEN_AT_KEY = '_written_at'
+
+
+class SkipUnchangedMixin:
+    _loaded_fingerprint = None
+
+    def load(self):
+        data = super().load()
+        self._loaded_fingerprint = self._fingerprint(data)
+        return data
+
+    def save(self, must_create=False):
+        if self.session_key is None or must_create:
+            return super().save(must_create)
+        data = self._get_session()
+        written_at = data.get(WRITTEN_AT_KEY, 0)
+        if (self._fingerprint(data) == self._loaded_fingerprint
+                and time.time() - written_at < settings.SESSION_REFRESH_INTERVAL):
+            return
+        data[WRITTEN_AT_KEY] = int(time.time())
+        super().save(must_create)
+        self._loaded_fingerprint = self._fingerprint(data)
+
+    def create(self):
+        self._session[WRITTEN_AT_KEY] = int(time.time())
+        super().create()
+        self._loaded_fingerprint = self._fingerprint(self._session)
+
+    def _fingerprint(self, data):
+        return self.serializer().dumps({key: value for key, value in data.items() if key != WRITTEN_AT_KEY})
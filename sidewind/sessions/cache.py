@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.contrib.sessions.backends import cache
+from django.core.exceptions import ImproperlyConfigured
+
+from sidewind.cache import BACKENDS
+
+from . import SkipUnchangedMixin
+
+# A file cache culls entries at random once full, and a culled session is a
+# logout or a lost cart when there is no database copy behind it
+if settings.CACHES[settings.SESSION_CACHE_ALIAS]['BACKEND'] == BACKENDS['file']:
+    raise ImproperlyConfigured(
+        'sidewind.sessions.cache needs a cache that keeps every session (Redis); '
+        'use sidewind.sessions.cached_db with the file cache'
+    )
+
+
+class SessionStore(SkipUnchangedMixin, cache.SessionStore):
+    pass
@@ -0,0 +1,29 @@
+import random
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+from . import SkipUnchangedMixin
+
+
+def purge_expired(batch_size, now=None):
+    """Delete up to ``batch_size`` sessions expired before ``now``; returns how many."""
+    now = now or timezone.now()
+    # One short single-statement delete, so the session table is never
+    # locked for long
+    keys = list(Session.objects.filter(expire_date__lt=now).values_list('session_key', flat=True)[:batch_size])
+    if not keys:
+        return 0
+    return Session.objects.filter(session_key__in=keys, expire_date__lt=now).delete()[0]
+
+
+class SessionStore(SkipUnchangedMixin, cached_db.SessionStore):
+    def create(self):
+        super().create()
+        # Without the purge_sessions cron job, new sessions clear out old
+        # ones: a batch for every 1/SESSION_PURGE_PROBABILITY sessions
+        # created removes expired rows faster than they pile up
+        if random.random() < settings.SESSION_PURGE_PROBABILITY:
+            purge_expired(settings.SESSION_PURGE_BATCH_SIZE)
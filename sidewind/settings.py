@@ -5,6 +5,10 @@ Django settings for sidewind project.
 import os
 from pathlib import Path
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
+
+from .cache import parse_cache_url
+from .database import parse_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -31,24 +35,34 @@ INSTALLED_APPS = [
     'products',
     'cart',
     'orders',
+    'reports',
+    'sidewind',
 ]
 
 MIDDLEWARE = [
+    'sidewind.middleware.RequestTimingMiddleware',
+    'sidewind.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'sidewind.middleware.StaticFilesMiddleware',
+    'sidewind.routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'sidewind.middleware.RequestProfilingMiddleware',
+    'sidewind.middleware.PageCacheMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'sidewind.urls'
+# sidewind/asgi.py switches this to sidewind.asgi_urls, which serves the
+# async variants of the hot catalog and cart views
+ROOT_URLCONF = config('ROOT_URLCONF', default='sidewind.urls')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django's backend, instrumented for RequestTimingMiddleware
+        'BACKEND': 'sidewind.timing.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -58,19 +72,113 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'cart.context_processors.cart',
+                'products.context_processors.catalog',
+                'sidewind.pagecache.page_cache',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'sidewind.wsgi.application'
+ASGI_APPLICATION = 'sidewind.asgi.application'
 
 # Database
+# DATABASE_URL selects the primary (SQLite by default, PostgreSQL in
+# production); DATABASE_REPLICA_URL optionally adds a read replica that
+# serves catalog reads (see sidewind/routers.py).
+CONN_MAX_AGE = config('CONN_MAX_AGE', default=60, cast=int)
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': parse_database_url(
+        config('DATABASE_URL', default='sqlite:///db.sqlite3'), BASE_DIR, conn_max_age=CONN_MAX_AGE,
+    ),
+}
+
+DATABASE_REPLICA_URL = config('DATABASE_REPLICA_URL', default='')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = parse_database_url(DATABASE_REPLICA_URL, BASE_DIR, conn_max_age=CONN_MAX_AGE)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['sidewind.routers.ReplicaRouter']
+# Apps whose reads may be served by the replica
+REPLICA_READ_APPS = {'products'}
+# How long a client keeps reading from the primary after a write
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=10, cast=int)
+
+# Request timing (sidewind.middleware.RequestTimingMiddleware)
+# Share of requests timed; each adds a Server-Timing header and a log line.
+# MetricsMiddleware instruments every request regardless.
+REQUEST_TIMING_SAMPLE_RATE = config('REQUEST_TIMING_SAMPLE_RATE', default=1.0 if DEBUG else 0.05, cast=float)
+REQUEST_TIMING_HEADER = config('REQUEST_TIMING_HEADER', default=True, cast=bool)
+
+# Request profiling (sidewind/profiling.py): how long a staff member's
+# profiling token stays valid, in seconds
+REQUEST_PROFILE_TOKEN_MAX_AGE = config('REQUEST_PROFILE_TOKEN_MAX_AGE', default=3600, cast=int)
+
+# Slow-query log (sidewind/slowqueries.py): queries slower than the
+# threshold are appended to SLOW_QUERY_LOG as JSON lines, with the code
+# that ran them; each statement shape gets an EXPLAIN at most once per
+# interval (seconds) per process. Summarize with slow_query_report.
+SLOW_QUERY_THRESHOLD_MS = config('SLOW_QUERY_THRESHOLD_MS', default=100, cast=float)
+SLOW_QUERY_EXPLAIN_INTERVAL = config('SLOW_QUERY_EXPLAIN_INTERVAL', default=300, cast=int)
+SLOW_QUERY_LOG = config('SLOW_QUERY_LOG', default=str(BASE_DIR / 'slow_queries.jsonl'))
+
+# Bearer token Prometheus scrapes /metrics with; unset disables the
+# endpoint outside DEBUG
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+        'slow_queries': {
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'formatter': 'message',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'sidewind': {'handlers': ['console'], 'level': config('SIDEWIND_LOG_LEVEL', default='INFO')},
+        'sidewind.slowqueries': {'handlers': ['slow_queries'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
+# Cache
+# CACHE_URL is the cache shared by all workers: Redis (redis://host:6379/0)
+# in production, a directory (file:///...) for development, or locmem://
+# for tests. The file cache lists its directory on every write and culls
+# beyond 300 entries, so it is too slow and too small for real traffic. The 'tiered' alias
+# adds a per-process L1 in front of it (see sidewind/cache.py).
+# Cache namespace versions get their own alias, so cached pages and
+# summaries can't evict them. With the file backend that is a separate
+# directory; on Redis use a volatile-* eviction policy, since versions
+# never expire.
+CACHE_URL = config('CACHE_URL', default='file:///.cache/django')
+NAMESPACE_CACHE_URL = config(
+    'NAMESPACE_CACHE_URL', default='file:///.cache/namespaces' if CACHE_URL.startswith('file:') else CACHE_URL,
+)
+# Sessions likewise get their own alias (see SESSION_ENGINE below)
+SESSION_CACHE_URL = config(
+    'SESSION_CACHE_URL', default='file:///.cache/sessions' if CACHE_URL.startswith('file:') else CACHE_URL,
+)
+CACHES = {
+    'default': parse_cache_url(CACHE_URL, BASE_DIR),
+    'namespaces': parse_cache_url(NAMESPACE_CACHE_URL, BASE_DIR),
+    'sessions': parse_cache_url(SESSION_CACHE_URL, BASE_DIR),
+    'tiered': {
+        'BACKEND': 'sidewind.cache.TieredCache',
+        'LOCATION': 'default',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'L1_TIMEOUT': config('CACHE_L1_TIMEOUT', default=5, cast=int),
+            'L1_MAX_ENTRIES': 1000,
+        },
+    },
 }
 
 # Password validation
@@ -102,10 +210,38 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+# collectstatic minifies, hashes and gzip/Brotli-compresses static files,
+# which WhiteNoise then serves with an immutable Cache-Control
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'sidewind.storage.MinifiedStaticFilesStorage',
+    },
+}
+
+# Rules inlined into the page head by {% critical_css %}, per stylesheet:
+# everything needed to render the navigation and hero before the full
+# stylesheet arrives
+CRITICAL_CSS_SELECTORS = {
+    'css/style.css': [':root', '*', 'body', '.navbar', '.hero-section', '.btn', '.badge'],
+}
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are streamed to a temporary file in chunks rather than held in memory
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Profile pictures are resized on a background thread pool (accounts.images)
+PROFILE_PICTURE_SIZE = 512
+PROFILE_PICTURE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+PROFILE_IMAGE_WORKERS = config('PROFILE_IMAGE_WORKERS', default=2, cast=int)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -121,6 +257,58 @@ LOGOUT_REDIRECT_URL = '/'
 STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY', default='')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='')
 
+# Order numbers. The secret keys the permutation that scrambles order
+# numbers; changing it once orders exist can reissue an existing number.
+# Anyone who knows it can turn order numbers back into a running count, so
+# the development default is refused outside DEBUG.
+ORDER_NUMBER_SECRET = config('ORDER_NUMBER_SECRET', default='sidewind-order-numbers' if DEBUG else '')
+if not ORDER_NUMBER_SECRET:
+    raise ImproperlyConfigured('Set ORDER_NUMBER_SECRET to a long random string when DEBUG is off.')
+ORDER_NUMBER_BLOCK_SIZE = config('ORDER_NUMBER_BLOCK_SIZE', default=100, cast=int)
+
+# Order archival: delivered/cancelled orders untouched for this long are
+# moved to the archive tables by the archive_orders command
+ORDER_ARCHIVE_AFTER_DAYS = config('ORDER_ARCHIVE_AFTER_DAYS', default=365, cast=int)
+ORDER_ARCHIVE_BATCH_SIZE = config('ORDER_ARCHIVE_BATCH_SIZE', default=500, cast=int)
+
+# Sessions (sidewind/sessions): sidewind.sessions.cached_db reads through
+# the shared cache and writes to the database too; sidewind.sessions.cache
+# keeps sessions in the cache only. Both skip unchanged writes and refresh
+# an unchanged session's expiry at most every SESSION_REFRESH_INTERVAL
+# seconds. The 'sessions' alias (SESSION_CACHE_URL) is shared by all
+# workers and holds nothing else, so page and summary entries can't evict
+# sessions; the tiered alias would let a worker serve a stale session from
+# its L1. sidewind.sessions.cache refuses the file backend.
+SESSION_ENGINE = config('SESSION_ENGINE', default='sidewind.sessions.cached_db')
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_SAVE_EVERY_REQUEST = config('SESSION_SAVE_EVERY_REQUEST', default=False, cast=bool)
+SESSION_REFRESH_INTERVAL = config('SESSION_REFRESH_INTERVAL', default=3600, cast=int)
+# Expired database sessions are deleted SESSION_PURGE_BATCH_SIZE at a time,
+# by the purge_sessions command and by sidewind.sessions.cached_db on
+# SESSION_PURGE_PROBABILITY of new sessions (0 leaves it to the command)
+SESSION_PURGE_BATCH_SIZE = config('SESSION_PURGE_BATCH_SIZE', default=1000, cast=int)
+SESSION_PURGE_PROBABILITY = config('SESSION_PURGE_PROBABILITY', default=0.01, cast=float)
+
+# Conditional catalog pages (sidewind/conditional.py): how long an
+# anonymous visitor's browser may reuse a product or category page before
+# revalidating it, in seconds. RELEASE is part of every page ETag; set it
+# to the deployed revision so template changes reach cached pages.
+CATALOG_PAGE_MAX_AGE = config('CATALOG_PAGE_MAX_AGE', default=0, cast=int)
+RELEASE = config('RELEASE', default='')
+
+# Full-page cache (sidewind/pagecache.py) for anonymous visitors: the URL
+# names it serves with the query parameters each view reads (base.html's
+# search box shows q on every page; requests with other parameters aren't
+# cached), and how long a page is kept if no catalog change invalidates it
+# first (seconds; 0 turns it off)
+PAGE_CACHE_VIEWS = {
+    'home': {'q'},
+    'product_list': {'q', 'category', 'min_price', 'max_price', 'sort', 'page'},
+    'product_detail': {'q'},
+    'category_detail': {'q', 'page'},
+}
+PAGE_CACHE_TIMEOUT = config('PAGE_CACHE_TIMEOUT', default=300, cast=int)
+
 # Cart session key
 CART_SESSION_ID = 'cart'
 
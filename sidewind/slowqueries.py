@@ -0,0 +1,125 @@
+"""
+Slow-query capture.
+
+Every database connection gets an execute wrapper that times each query.
+Queries slower than ``SLOW_QUERY_THRESHOLD_MS`` are logged as one JSON line
+to the ``sidewind.slowqueries`` logger (written to ``SLOW_QUERY_LOG``),
+with the line of project code that ran them and the view being served.
+
+The first time a statement shape is slow in a process, and again every
+``SLOW_QUERY_EXPLAIN_INTERVAL`` seconds after that, its plan is captured
+with ``EXPLAIN`` (never ``ANALYZE``, so the statement doesn't run twice).
+``slow_query_report`` aggregates the log into a top-N table.
+
+Queries under the threshold cost two ``perf_counter`` calls.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from time import perf_counter
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .querybudget import app_frames, query_shape
+from .timing import current_timings
+
+logger = logging.getLogger('sidewind.slowqueries')
+
+EXPLAIN_SAVEPOINT = 'sidewind_explain'
+
+_explained = {}
+_explained_lock = threading.Lock()
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    if not any(isinstance(wrapper, SlowQueryWrapper) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.append(SlowQueryWrapper(connection))
+
+
+class SlowQueryWrapper:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        result = execute(sql, params, many, context)
+        elapsed = (perf_counter() - start) * 1000
+        if elapsed >= settings.SLOW_QUERY_THRESHOLD_MS:
+            try:
+                self.record(sql, params, many, elapsed)
+            except Exception:
+                # Diagnostics must never break the query that triggered them
+                logger.exception('Could not record a slow query')
+        return result
+
+    def record(self, sql, params, many, elapsed):
+        shape = query_shape(sql)
+        frames = app_frames(limit=5)
+        site = frames[-1] if frames else None
+        timings = current_timings()
+        request = timings.request if timings is not None else None
+        match = getattr(request, 'resolver_match', None)
+        entry = {
+            'time': time.time(),
+            'ms': round(elapsed, 2),
+            'alias': self.connection.alias,
+            'view': match.view_name if match else None,
+            'path': request.path if request is not None else None,
+            'site': f'{_relative(site.filename)}:{site.lineno}' if site else None,
+            'function': site.name if site else None,
+            'code': site.line if site else None,
+            'stack': [f'{_relative(frame.filename)}:{frame.lineno} in {frame.name}' for frame in frames],
+            'shape': shape,
+            'sql': sql,
+        }
+        if not many and self.should_explain(shape):
+            entry['explain'] = self.explain(sql, params)
+        logger.warning(json.dumps(entry, default=str))
+
+    def should_explain(self, shape):
+        if not shape.lstrip().upper().startswith('SELECT'):
+            return False
+        now = time.monotonic()
+        with _explained_lock:
+            last = _explained.get(shape)
+            if last is not None and now - last < settings.SLOW_QUERY_EXPLAIN_INTERVAL:
+                return False
+            _explained[shape] = now
+        return True
+
+    def explain(self, sql, params):
+        # A bare backend cursor, so the EXPLAIN doesn't pass through the
+        # execute wrappers and count as a query of the request. Inside a
+        # transaction it runs in a savepoint: on PostgreSQL a failed
+        # statement would otherwise abort the caller's transaction.
+        connection = self.connection
+        ops = connection.ops
+        savepoint = connection.in_atomic_block and connection.features.uses_savepoints
+        cursor = connection.create_cursor()
+        try:
+            if savepoint:
+                cursor.execute(ops.savepoint_create_sql(EXPLAIN_SAVEPOINT))
+            try:
+                cursor.execute(f'{ops.explain_query_prefix()} {sql}', params)
+                rows = cursor.fetchall()
+            # The bare cursor raises the driver's own exceptions
+            except (DatabaseError, connection.Database.Error) as exc:
+                if savepoint:
+                    cursor.execute(ops.savepoint_rollback_sql(EXPLAIN_SAVEPOINT))
+                return f'EXPLAIN failed: {exc}'
+            finally:
+                if savepoint:
+                    cursor.execute(ops.savepoint_commit_sql(EXPLAIN_SAVEPOINT))
+            return '\n'.join(' '.join(str(column) for column in row) for row in rows)
+        finally:
+            cursor.close()
+
+
+def _relative(filename):
+    return os.path.relpath(filename, settings.BASE_DIR)
@@ -0,0 +1,37 @@
+from functools import lru_cache
+
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.utils.safestring import mark_safe
+
+from sidewind.storage import critical_css_name, extract_critical_css
+
+register = template.Library()
+
+
+@lru_cache(maxsize=None)
+def _collected_critical_css(name):
+    with staticfiles_storage.open(staticfiles_storage.stored_name(critical_css_name(name))) as source:
+        return source.read().decode()
+
+
+def _source_critical_css(name):
+    # Before collectstatic (development), extract from the source stylesheet
+    with open(finders.find(name), encoding='utf-8') as source:
+        return extract_critical_css(source.read(), settings.CRITICAL_CSS_SELECTORS[name])
+
+
+@register.simple_tag
+def critical_css(name):
+    """Inline the critical rules of stylesheet ``name`` in a <style> element."""
+    if settings.DEBUG:
+        css = _source_critical_css(name)
+    else:
+        try:
+            css = _collected_critical_css(name)
+        except (ValueError, FileNotFoundError):
+            # Not collected yet
+            css = _source_critical_css(name)
+    return mark_safe(f'<style>{css}</style>')
@@ -0,0 +1,13 @@
+from django.test import TestCase
+
+from .querybudget import growth_failures, measure_budgets, uncovered_urls
+
+
+class QueryBudgetTests(TestCase):
+    def test_every_url_has_a_budget_check(self):
+        self.assertEqual(uncovered_urls(), [])
+
+    def test_query_counts_do_not_grow_with_data(self):
+        counts, queries = measure_budgets()
+        failures = growth_failures(counts, queries)
+        self.assertFalse(failures, 'Query counts grow with data size:\n\n' + '\n\n'.join(failures))
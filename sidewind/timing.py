@@ -0,0 +1,140 @@
+"""
+Per-request timing.
+
+``MetricsMiddleware`` and ``RequestTimingMiddleware`` (sidewind/middleware.py)
+open a ``RequestTimings`` around a request; while it is active the hooks
+here add to it:
+
+- every database query, through an execute wrapper installed on each new
+  connection;
+- template rendering, through the ``DjangoTemplates`` backend below, with
+  the time spent in context processors (which run on every page) split
+  out;
+- tiered cache hits and misses (sidewind/cache.py).
+
+Outside a timed request each hook costs one context variable lookup.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self, request=None):
+        self.request = request
+        self.start = perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.template_time = 0.0
+        self.context_processor_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Per-query and per-template detail, kept only when a caller sets
+        # these to lists (the request profiler does)
+        self.query_log = None
+        self.template_log = None
+
+    @property
+    def total_time(self):
+        return perf_counter() - self.start
+
+
+def current_timings():
+    return _current.get()
+
+
+@contextmanager
+def timing(request=None):
+    """Time the enclosed request, or join the timing already in progress."""
+    timings = _current.get()
+    if timings is not None:
+        if timings.request is None:
+            timings.request = request
+        yield timings
+        return
+    timings = RequestTimings(request)
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def _time_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = perf_counter() - start
+        timings.db_time += elapsed
+        timings.queries += 1
+        if timings.query_log is not None:
+            timings.query_log.append((sql, elapsed))
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # Installed for the connection's lifetime rather than per request, so
+    # queries run from sync_to_async threads are counted too
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def timed_context_processor(processor):
+    @wraps(processor)
+    def wrapper(request):
+        timings = _current.get()
+        if timings is None:
+            return processor(request)
+        start = perf_counter()
+        try:
+            return processor(request)
+        finally:
+            timings.context_processor_time += perf_counter() - start
+    return wrapper
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The stock backend, timing renders and each context processor."""
+
+    def __init__(self, params):
+        super().__init__(params)
+        self.engine.template_context_processors = tuple(
+            timed_context_processor(processor) for processor in self.engine.template_context_processors
+        )
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        if timings is None:
+            return super().render(context, request)
+        start = perf_counter()
+        context_processor_time = timings.context_processor_time
+        try:
+            return super().render(context, request)
+        finally:
+            elapsed = perf_counter() - start - (timings.context_processor_time - context_processor_time)
+            timings.template_time += elapsed
+            if timings.template_log is not None:
+                timings.template_log.append((self.template.name, elapsed))
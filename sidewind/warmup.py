@@ -0,0 +1,49 @@
+"""
+Work done once per process before it serves traffic, so the first requests
+a worker handles don't pay for it.
+
+``warm_up_code`` only builds in-memory structures and is safe to run in the
+gunicorn master before forking, where workers share the result
+copy-on-write. ``warm_up_caches`` queries the database and runs in each
+worker.
+"""
+import logging
+from pathlib import Path
+
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+from django.urls import get_resolver, reverse
+
+from products.context_processors import get_categories
+from products.views import home_listings
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up_code():
+    # Imports every view module (stripe, Pillow, ...) and builds the
+    # resolver's pattern and reverse lookup tables
+    resolver = get_resolver()
+    resolver.resolve('/')
+    reverse('home')
+
+    # Compile the project templates into the cached template loader
+    count = 0
+    for engine in engines.all():
+        for directory in engine.dirs:
+            for path in Path(directory).rglob('*.html'):
+                name = path.relative_to(directory).as_posix()
+                try:
+                    engine.get_template(name)
+                except TemplateSyntaxError:
+                    # Report it, but a broken page shouldn't keep the site down
+                    logger.exception('Template %s failed to compile', name)
+                    continue
+                count += 1
+    logger.info('Warmed up URL resolvers and %d templates', count)
+
+
+def warm_up_caches():
+    get_categories()
+    home_listings()
+    logger.info('Warmed up catalog caches')
@@ -103,6 +103,47 @@ document.addEventListener('DOMContentLoaded', function() {
 
     images.forEach(img => imageObserver.observe(img));
 
+    // Fade cards in as they scroll into view
+    const cardObserver = new IntersectionObserver((entries) => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                entry.target.classList.add('fade-in-up');
+                cardObserver.unobserve(entry.target);
+            }
+        });
+    }, {
+        threshold: 0.1,
+        rootMargin: '0px 0px -50px 0px'
+    });
+
+    document.querySelectorAll('.card, .category-card').forEach(card => cardObserver.observe(card));
+
+    // Pages from the page cache leave out the cart count and CSRF tokens;
+    // fetch this visitor's
+    const cartStatusUrl = document.body.dataset.cartStatusUrl;
+    if (cartStatusUrl) {
+        fetch(cartStatusUrl, {
+            credentials: 'same-origin',
+            headers: {'X-Requested-With': 'XMLHttpRequest'}
+        })
+            .then(response => response.json())
+            .then(status => {
+                document.querySelectorAll('[data-cart-count]').forEach(badge => {
+                    badge.textContent = status.item_count;
+                });
+                document.querySelectorAll('form[method="post" i]').forEach(form => {
+                    let input = form.querySelector('input[name="csrfmiddlewaretoken"]');
+                    if (!input) {
+                        input = document.createElement('input');
+                        input.type = 'hidden';
+                        input.name = 'csrfmiddlewaretoken';
+                        form.prepend(input);
+                    }
+                    input.value = status.csrf_token;
+                });
+            });
+    }
+
     // Cart item count update
     function updateCartCount() {
         const cartBadge = document.querySelector('.badge');
@@ -153,27 +194,23 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     // Back to top button
-    const backToTopButton = document.createElement('button');
-    backToTopButton.innerHTML = '<i class="fas fa-arrow-up"></i>';
-    backToTopButton.className = 'btn btn-primary position-fixed';
-    backToTopButton.style.cssText = 'bottom: 20px; right: 20px; z-index: 1000; border-radius: 50%; width: 50px; height: 50px; display: none;';
-    
-    document.body.appendChild(backToTopButton);
-
-    window.addEventListener('scroll', () => {
-        if (window.pageYOffset > 300) {
-            backToTopButton.style.display = 'block';
-        } else {
-            backToTopButton.style.display = 'none';
-        }
-    });
+    const backToTopButton = document.getElementById('backToTop');
+    if (backToTopButton) {
+        window.addEventListener('scroll', () => {
+            if (window.pageYOffset > 300) {
+                backToTopButton.style.display = 'block';
+            } else {
+                backToTopButton.style.display = 'none';
+            }
+        });
 
-    backToTopButton.addEventListener('click', () => {
-        window.scrollTo({
-            top: 0,
-            behavior: 'smooth'
+        backToTopButton.addEventListener('click', () => {
+            window.scrollTo({
+                top: 0,
+                behavior: 'smooth'
+            });
         });
-    });
+    }
 
     // Product image gallery (if needed)
     const productImages = document.querySelectorAll('.product-image');